@@ -31,6 +31,7 @@
 
 # import factory code for kaa.metadata access
 from .factory import *
+from .aio import aparse, aparse_many
 
 from .core import Media, MEDIA_AUDIO, MEDIA_VIDEO, MEDIA_IMAGE, MEDIA_AV, \
      MEDIA_SUBTITLE, MEDIA_CHAPTER, MEDIA_DIRECTORY, MEDIA_DISC, MEDIA_GAME, \
@@ -40,55 +41,13 @@ from .core import Media, MEDIA_AUDIO, MEDIA_VIDEO, MEDIA_IMAGE, MEDIA_AV, \
 # use network functions
 USE_NETWORK = 1
 
-# Audio parsers
-register('audio/mpeg', ('mp3',), 'audio.mp3')
-register('audio/ac3', ('ac3',), 'audio.ac3')
-register('application/adts', ('aac',), 'audio.adts')
-register('audio/m4a', ('m4a',), 'audio.m4a')
-register('application/ogg', ('ogg',), 'audio.ogg', magic='OggS\00')
-register('application/pcm', ('aif','voc','au'), 'audio.pcm')
+# names imported from their module on first use, most programs do not
+# need them
+_LAZY = { 'Server': 'server', 'Client': 'server', 'ServerError': 'server',
+          'scan': 'scanner' }
 
-# Video parsers
-register('video/asf', ('asf','wmv','wma'), 'video.asf')
-register('video/flv', ('flv',), 'video.flv')
-register('application/mkv', ('mkv', 'mka', 'webm'), 'video.mkv')
-register('video/quicktime', ('mov', 'qt', 'mp4', 'mp4a', '3gp', '3gp2', 'mk2'), 'video.mp4')
-register('video/mpeg', ('mpeg','mpg','mp4', 'ts'), 'video.mpeg')
-register('application/ogg', ('ogm', 'ogg'), 'video.ogm')
-register('video/real', ('rm', 'ra', 'ram'), 'video.real')
-register('video/avi', ('wav','avi'), 'video.riff')
-register('video/vcd', ('cue',), 'video.vcd')
-
-# Disc parsers
-register('audio/cd', EXTENSION_DEVICE, 'disc.audio')
-register('video/dvd', EXTENSION_DEVICE, 'disc.dvd')
-register('video/dvd', EXTENSION_DIRECTORY, 'disc.dvd')
-register('video/dvd', ('iso',), 'disc.dvd')
-register('video/vcd', EXTENSION_DEVICE, 'disc.vcd')
-register('cd/unknown', EXTENSION_DEVICE, 'disc.data')
-
-# Image parsers
-if 0:
-    # exiv2 based generic image parser. Experimental
-    # add list of all supported extensions
-    register('image/tiff', ('tif','tiff', 'jpg'), 'image.generic')
-    register('image/png', ('png',), 'image.png')
-else:
-    register('image/bmp', ('bmp', ), 'image.bmp')
-    register('image/gif', ('gif', ), 'image.gif')
-    register('image/jpeg', ('jpg','jpeg'), 'image.jpg')
-    register('image/png', ('png',), 'image.png')
-    register('image/tiff', ('tif','tiff'), 'image.tiff')
-
-# Games parsers
-register('games/gameboy', ('gba', 'gb', 'gbc'), 'games.gameboy')
-register('games/snes', ('smc', 'sfc', 'fig'), 'games.snes')
-
-# Misc parsers
-register('directory', EXTENSION_DIRECTORY, 'misc.directory')
-register('text/xml', ('xml', 'fxd', 'html', 'htm'), 'misc.xmlfile')
-
-# These parsers are prone to producing false positives, so we use them
-# last.  They should be fixed.
-register('text/plain', EXTENSION_STREAM, 'audio.webradio')
-register('application/flac', ('flac',), 'audio.flac')
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
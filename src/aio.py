@@ -0,0 +1,108 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# aio.py - asyncio interface to the parser
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+__all__ = [ 'aparse', 'aparse_many' ]
+
+# python imports
+import functools
+import threading
+import logging
+
+# kaa.metadata imports
+from . import factory
+
+# get logging object
+log = logging.getLogger('metadata')
+
+
+async def aparse(filename, force=True, fingerprint='opensubtitles', max_bytes=None,
+                 max_seconds=None, executor=None, fields=None):
+    """
+    Coroutine parsing a file in the executor (the default executor of
+    the loop if None) without blocking the event loop. The arguments
+    are passed to kaa.metadata.parse(). If the coroutine is cancelled,
+    the parse is abandoned at its next read from the file.
+    """
+    import asyncio
+    cancel = threading.Event()
+    call = functools.partial(factory.parse, filename, force, fingerprint=fingerprint,
+                             max_bytes=max_bytes, max_seconds=max_seconds, cancel=cancel,
+                             fields=fields)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, call)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+
+
+async def aparse_many(filenames, limit=8, force=True, fingerprint='opensubtitles',
+                      max_bytes=None, max_seconds=None, executor=None, fields=None):
+    """
+    Asynchronous generator parsing the files with at most limit parses
+    running at the same time. The results are yielded as (filename,
+    info) tuples in the order the parsing finishes, info is the Media
+    object or None. Without an executor, a thread pool with limit
+    threads is used. Parses still running when the generator is closed
+    are cancelled.
+    """
+    import asyncio
+    import concurrent.futures
+    own = executor is None
+    if own:
+        executor = concurrent.futures.ThreadPoolExecutor(limit)
+
+    async def run(filename):
+        return filename, await aparse(filename, force, fingerprint, max_bytes,
+                                      max_seconds, executor, fields)
+
+    filenames = iter(filenames)
+    pending = set()
+    try:
+        while True:
+            # only create tasks for free slots, filenames may be a
+            # long or endless iterator
+            while len(pending) < limit:
+                filename = next(filenames, None)
+                if filename is None:
+                    break
+                pending.add(asyncio.ensure_future(run(filename)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        if own:
+            executor.shutdown(wait=False)
@@ -113,6 +113,12 @@ FRMSIZCOD = [ 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192,
               224, 256, 320, 384, 448, 512, 576, 640 ]
 
 class AC3(core.Music):
+    @classmethod
+    def sniff(cls, head):
+        # without the ac3 extension the header must be at the beginning
+        return 0.5 if head[:2] == b'\x0b\x77' else 0
+
+
     def __init__(self,file):
         core.Music.__init__(self)
         if file.name.endswith('.ac3'):
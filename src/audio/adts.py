@@ -66,6 +66,12 @@ from . import core
 # crc_check                      16  only if protection_absent == 0
 #
 class ADTS(core.Music):
+    @classmethod
+    def sniff(cls, head):
+        # only files with the aac extension are detected
+        return 0
+
+
     def __init__(self,file):
         core.Music.__init__(self)
         if not file.name.endswith('aac'):
@@ -33,7 +33,8 @@
 import sys
 
 # kaa imports
-from ..core import ParseError, Media, Tags, Tag, MEDIA_AUDIO
+from ..core import ParseError, Media, Tags, Tag, MEDIA_AUDIO, read_view, file_size, \
+     wanted, binary_ref, BinaryRef
 
 AUDIOCORE = ['channels', 'samplerate', 'length', 'encoder', 'codec', 'format',
              'samplebits', 'bitrate', 'fourcc', 'trackno', 'id', 'userdate',
@@ -45,6 +45,11 @@ log = logging.getLogger('metadata')
 # See: http://flac.sourceforge.net/format.html
 
 class Flac(core.Music):
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:4] == b'fLaC' else 0
+
+
     def __init__(self,file):
         core.Music.__init__(self)
         if file.read(4) != b'fLaC':
@@ -61,8 +66,13 @@ class Flac(core.Music):
             numbytes = blockheader & 0xFFFFFF
             log.debug("Last?: %d, NumBytes: %d, Type: %d" % \
                       (lastblock, numbytes, type))
-            # Read this blocks the data
-            data = file.read(numbytes)
+            # Read this blocks the data, pictures are read when used
+            start = file.tell()
+            if type == 6:
+                file.seek(numbytes, 1)
+                data = None
+            else:
+                data = file.read(numbytes)
             if type == 0:
                 # STREAMINFO
                 bits = struct.unpack('>L', data[10:14])[0]
@@ -111,27 +121,40 @@ class Flac(core.Music):
                 pass
             elif type == 6:
                 # PICTURE
-                picture_type = struct.unpack('>L', data[:4])[0]
-                mime_len = struct.unpack('>L', data[4:8])[0]
-                desc_len = struct.unpack('>L', data[8+mime_len:8+mime_len+4])[0]
-                data_offset = 8 + mime_len + 4 + desc_len + 20
-                self._appendtable('PICTURE', {
-                    picture_type: {
-                        'mime': data[8:8+mime_len],
-                        'desc': data[8+mime_len+4:8+mime_len+4+desc_len],
-                        'data': data[data_offset:]
-                    },
-                })
-                # Set the thumbnail to this picture data, preferring type 3 (front cover)
-                # over others.
-                if not self.thumbnail or picture_type == 3:
-                    self.thumbnail = data[data_offset:]
+                if core.wanted(file, 'thumbnail', 'tables'):
+                    self._picture(file, start, numbytes)
             else:
                 # UNKNOWN TYPE
                 pass
             if lastblock:
                 break
 
+    def _picture(self, file, start, size):
+        """
+        Parse the PICTURE block at start. The image data is not read.
+        """
+        file.seek(start)
+        picture_type, mime_len = struct.unpack('>LL', file.read(8))
+        mime = file.read(mime_len)
+        desc_len = struct.unpack('>L', file.read(4))[0]
+        desc = file.read(desc_len)
+        # skip width, height, depth, colors and data length
+        offset = file.tell() + 20
+        image = core.binary_ref(file, offset, start + size - offset)
+        file.seek(start + size)
+        self._appendtable('PICTURE', {
+            picture_type: {
+                'mime': mime,
+                'desc': desc,
+                'data': image
+            },
+        })
+        # Set the thumbnail to this picture data, preferring type 3 (front cover)
+        # over others.
+        if not self.thumbnail or picture_type == 3:
+            self.thumbnail = image
+
+
     def _extractHeaderString(self,header):
         len = struct.unpack( '<I', header[:4] )[0]
         return (len+4,str(header[4:4+len], 'utf-8'))
@@ -168,6 +168,11 @@ class M4ATags(dict):
 
 class Mpeg4Audio(core.Music):
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[4:12] == b'ftypM4A ' else 0
+
+
     def __init__(self, file):
         core.Music.__init__(self)
         tags = M4ATags(file)
@@ -134,6 +134,13 @@ class MP3(core.Music):
     fileName       = str()
     fileSize       = int()
 
+    @classmethod
+    def sniff(cls, head):
+        # An ID3 tag is likely an mp3, but other files may carry one
+        # too. Without a tag the frame sync is too weak to rate.
+        return 0.5 if head[:3] == b'ID3' else None
+
+
     def __init__(self, file):
         core.Music.__init__(self)
         self.fileName = file.name
@@ -141,8 +148,12 @@ class MP3(core.Music):
         self.mime = 'audio/mpeg'
 
         id3 = None
+        skip = ()
+        if not core.wanted(file, 'thumbnail', 'tables', 'tags'):
+            # the cover is the largest frame, do not read it
+            skip = ('APIC', 'PIC')
         try:
-            id3 = stagger.read_tag(file.name)
+            id3 = stagger.read_tag(file, skip)
         except stagger.NoTagError:
             # File is not an MP3
             raise core.ParseError()
@@ -159,6 +170,8 @@ class MP3(core.Music):
             if log.level < 30:
                 log.exception('mp3 tag parsing %s failed!' % file.name)
 
+        # stagger may have stopped anywhere inside the tag
+        file.seek(0)
         if not id3:
             # let's take a look at the header
             s = file.read(4096)
@@ -33,8 +33,6 @@ __all__ = ['Parser']
 
 # python imports
 import re
-import os
-import stat
 import struct
 import logging
 import base64
@@ -63,6 +61,11 @@ FIELD_MAP = {
 }
 
 class Ogg(core.Music):
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:5] == b'OggS\x00' else 0
+
+
     def __init__(self,file):
         core.Music.__init__(self)
         h = file.read(4+1+1+20+1)
@@ -140,8 +143,9 @@ class Ogg(core.Music):
 
     def _calculateTrackLength(self,f):
         # seek to the end of the stream, to avoid scanning the whole file
-        if (os.stat(f.name)[stat.ST_SIZE] > 20000):
-            f.seek(os.stat(f.name)[stat.ST_SIZE]-10000)
+        size = core.file_size(f)
+        if size > 20000:
+            f.seek(size-10000)
 
         # read the rest of the file into a buffer
         h = f.read()
@@ -77,10 +77,12 @@ _FRAME24_STATUS_DISCARD_ON_FILE_ALTER = 0x2000
 _FRAME24_STATUS_READ_ONLY = 0x1000
 _FRAME24_STATUS_UNKNOWN_MASK = 0x8F00
 
-def read_tag(filename):
+def read_tag(filename, skip=()):
+    """Read the ID3v2 tag of filename. The frames with the ids in
+    skip are not read from the file and not in the tag."""
     with fileutil.opened(filename, "rb") as file:
         (cls, offset, length) = detect_tag(file)
-        return cls.read(file, offset)
+        return cls.read(file, offset, skip)
 
 def decode_tag(data):
     return read_tag(io.BytesIO(data))
@@ -573,14 +575,15 @@ class Tag(collections.abc.MutableMapping, metaclass=abc.ABCMeta):
 
     # Reading tags
     @classmethod
-    def read(cls, filename, offset=0):
-        """Read an ID3v2 tag from a file."""
+    def read(cls, filename, offset=0, skip=()):
+        """Read an ID3v2 tag from a file, skipping the frames with
+        the ids in skip."""
         i = 0
         with fileutil.opened(filename, "rb") as file:
             file.seek(offset)
             tag = cls()
             tag._read_header(file)
-            for (frameid, bflags, data) in tag._read_frames(file):
+            for (frameid, bflags, data) in tag._read_frames(file, skip):
                 if len(data) == 0:
                     warn("{0}: Ignoring empty frame".format(frameid), 
                          EmptyFrameWarning)
@@ -632,7 +635,7 @@ class Tag(collections.abc.MutableMapping, metaclass=abc.ABCMeta):
     def _read_header(self, file): pass
 
     @abstractmethod
-    def _read_frames(self, file): pass
+    def _read_frames(self, file, skip=()): pass
 
     @abstractmethod
     def _interpret_frame_flags(self, frameid, bflags, data): pass
@@ -780,7 +783,7 @@ class Tag22(Tag):
             warn("Unknown ID3v2.2 flags", TagWarning)
         self.size = Syncsafe.decode(header[6:10]) + 10
 
-    def _read_frames(self, file):
+    def _read_frames(self, file, skip=()):
         if "unsynchronised" in self.flags:
             ufile = UnsyncReader(file)
         else:
@@ -791,7 +794,12 @@ class Tag22(Tag):
                 break
             frameid = header[0:3].decode("ASCII")
             size = Int8.decode(header[3:6])
+            if frameid in skip and ufile is file:
+                file.seek(size, 1)
+                continue
             data = fileutil.xread(ufile, size)
+            if frameid in skip:
+                continue
             yield (frameid, None, data)
 
     def _interpret_frame_flags(self, frameid, bflags, data):
@@ -925,7 +933,7 @@ class Tag23(Tag):
         if size > 6:
             fileutil.xread(file, size - 6)
 
-    def _read_frames(self, file):
+    def _read_frames(self, file, skip=()):
         if "unsynchronised" in self.flags:
             ufile = UnsyncReader(file)
         else:
@@ -937,7 +945,12 @@ class Tag23(Tag):
             frameid = header[0:4].decode("ASCII")
             size = Int8.decode(header[4:8])
             bflags = Int8.decode(header[8:10])
+            if frameid in skip and ufile is file:
+                file.seek(size, 1)
+                continue
             data = fileutil.xread(ufile, size)
+            if frameid in skip:
+                continue
             yield (frameid, bflags, data)
 
     def _interpret_frame_flags(self, frameid, bflags, data):
@@ -1133,7 +1146,7 @@ class Tag24(Tag):
             self.flags.add("ext:restrictions")
             (self.restrictions, data) = self.__read_extended_header_flag_data(data)
 
-    def _read_frames(self, file, syncsafe_workaround = None):
+    def _read_frames(self, file, skip=(), syncsafe_workaround = None):
         # Older versions of iTunes stored frame sizes as straight 8bit integers,
         # not syncsafe values as the spec requires.
         # (The bug is known to be fixed in iTunes 8.2.)
@@ -1170,8 +1183,11 @@ class Tag24(Tag):
                         raise
                     warn("Invalid syncsafe frame size; switching to 8-bit mode")
                     file.seek(origfpos)
-                    return self._read_frames(file, True)
+                    return self._read_frames(file, skip, True)
             bflags = Int8.decode(header[8:10])
+            if frameid in skip:
+                file.seek(size, 1)
+                continue
             data = fileutil.xread(file, size)
             frames.append((frameid, bflags, data))
         return frames
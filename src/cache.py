@@ -0,0 +1,327 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# cache.py - persistent cache for parse results
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+__all__ = [ 'Cache' ]
+
+# python imports
+import io
+import os
+import time
+import pickle
+import sqlite3
+import logging
+import threading
+import importlib.util
+
+# kaa.metadata imports
+from . import utils
+from .core import BinaryRef
+
+# get logging object
+log = logging.getLogger('metadata')
+
+# increase when the layout of the database changes, old caches are
+# dropped on open
+SCHEMA_VERSION = 4
+
+# check the cache limits after this many new entries
+EVICT_INTERVAL = 1000
+
+# seconds a file no parser accepted is remembered
+NEGATIVE_TTL = 7 * 24 * 3600
+
+_versions = {}
+
+def parser_version(module):
+    """
+    Return a version string for the given parser module. It changes
+    whenever the module file is changed or replaced by an update. The
+    module is not imported.
+    """
+    if module not in _versions:
+        try:
+            st = os.stat(importlib.util.find_spec(module).origin)
+            _versions[module] = '%d-%d' % (st.st_mtime_ns, st.st_size)
+        except (ImportError, AttributeError, TypeError, ValueError, OSError):
+            _versions[module] = None
+    return _versions[module]
+
+
+def parsers_signature(parsers):
+    """
+    Return a string with the given parser modules and their versions.
+    """
+    return ' '.join('%s=%s' % (module, parser_version(module)) for module in parsers)
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Pickler storing references to data in the parsed file without the
+    path, the file may be renamed while the entry is used.
+    """
+    def __init__(self, file, path):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self.path = path
+
+
+    def persistent_id(self, obj):
+        if isinstance(obj, BinaryRef) and obj.path == self.path:
+            return obj.offset, obj.length, obj.transform
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    """
+    Unpickler creating the references stored by _Pickler for the
+    current path of the file.
+    """
+    def __init__(self, file, path):
+        pickle.Unpickler.__init__(self, file)
+        self.path = path
+
+
+    def persistent_load(self, pid):
+        return BinaryRef(self.path, *pid)
+
+
+class Cache(object):
+    """
+    Cache for parse results in a sqlite database. Entries are keyed on
+    device, inode, size and mtime of the file and the parse options and
+    store the result of Media.convert(). An entry is dropped when the parser module that
+    created it changed. The least recently used entries are removed if
+    there are more than max_entries or the stored data is larger than
+    max_size bytes. The access times of cache hits are kept in memory
+    and written with the eviction check or when the cache is closed.
+    References to data in the file itself are stored without the path
+    and point to the path given to get().
+
+    Files no parser accepted are stored with the parsers tried for
+    negative_ttl seconds or until one of these parsers changed.
+    """
+    def __init__(self, path=None, max_entries=1000000, max_size=None,
+                 negative_ttl=NEGATIVE_TTL):
+        if path is None:
+            path = os.path.join(utils.get_temp_path('kaa-metadata'), 'cache.db')
+        self.path = path
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._lock = threading.RLock()
+        self._db = None
+        self._pid = None
+        self._new = 0
+        # access times of cache hits not written yet, see _flush
+        self._atimes = {}
+
+
+    def _connect(self):
+        """
+        Return the database connection. Connections are not shared with
+        forked children, they open their own.
+        """
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            # a lost write only costs a parse, no need to sync every commit
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            if db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                log.info('creating metadata cache %s', self.path)
+                db.execute('DROP TABLE IF EXISTS media')
+                db.execute('DROP TABLE IF EXISTS failed')
+                db.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+            db.execute('CREATE TABLE IF NOT EXISTS media (dev INTEGER, ino INTEGER, '
+                       'size INTEGER, mtime INTEGER, options TEXT, parser TEXT, '
+                       'version TEXT, atime REAL, data BLOB, '
+                       'PRIMARY KEY (dev, ino, size, mtime, options))')
+            db.execute('CREATE INDEX IF NOT EXISTS media_atime ON media (atime)')
+            db.execute('CREATE TABLE IF NOT EXISTS failed (dev INTEGER, ino INTEGER, '
+                       'size INTEGER, mtime INTEGER, options TEXT, parsers TEXT, '
+                       'ctime REAL, PRIMARY KEY (dev, ino, size, mtime, options))')
+            db.commit()
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+
+    def get(self, st, options='', path=None):
+        """
+        Return the cached dict for the file with the given stat result
+        parsed with the given options or None if it is not in the cache.
+        BinaryRefs into the file are read from path.
+        """
+        key = st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, options
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT parser, version, data FROM media WHERE dev=? AND '
+                             'ino=? AND size=? AND mtime=? AND options=?', key).fetchone()
+            if row is None:
+                return None
+            if row[1] != parser_version(row[0]):
+                # parser changed since the entry was created
+                db.execute('DELETE FROM media WHERE dev=? AND ino=? AND size=? AND '
+                           'mtime=? AND options=?', key)
+                db.commit()
+                return None
+            # reading must not write to the database, the access time
+            # is stored with the next eviction check
+            self._atimes[key] = time.time()
+            if len(self._atimes) >= EVICT_INTERVAL:
+                self._flush()
+        try:
+            return _Unpickler(io.BytesIO(row[2]), path).load()
+        except Exception:
+            log.exception('bad cache entry')
+            return None
+
+
+    def set(self, st, info, parser, options='', path=None):
+        """
+        Store the dict info for the file with the given stat result
+        parsed with the given options. The parser is the module name of
+        the parser that created it, path the absolute path of the file.
+        """
+        buf = io.BytesIO()
+        _Pickler(buf, path).dump(info)
+        data = buf.getvalue()
+        with self._lock:
+            db = self._connect()
+            db.execute('INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, options,
+                        parser, parser_version(parser), time.time(), data))
+            db.commit()
+            self._new += 1
+            if self._new >= EVICT_INTERVAL:
+                self.evict()
+
+
+    def get_failed(self, st, options=''):
+        """
+        Return True if no parser accepted the file with the given stat
+        result and options and the parsers did not change since.
+        """
+        key = st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, options
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT parsers, ctime FROM failed WHERE dev=? AND '
+                             'ino=? AND size=? AND mtime=? AND options=?', key).fetchone()
+            if row is None:
+                return False
+            if row[1] + self.negative_ttl < time.time() or \
+                   row[0] != parsers_signature(m.split('=')[0] for m in row[0].split()):
+                # expired or parser changed since the entry was created
+                db.execute('DELETE FROM failed WHERE dev=? AND ino=? AND size=? AND '
+                           'mtime=? AND options=?', key)
+                db.commit()
+                return False
+        return True
+
+
+    def set_failed(self, st, parsers, options=''):
+        """
+        Remember that none of the given parser modules accepted the file
+        with the given stat result and options.
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute('INSERT OR REPLACE INTO failed VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, options,
+                        parsers_signature(parsers), time.time()))
+            db.commit()
+            self._new += 1
+            if self._new >= EVICT_INTERVAL:
+                self.evict()
+
+
+    def _flush(self):
+        """
+        Write the access times of the cache hits to the database.
+        """
+        with self._lock:
+            if not self._atimes:
+                return
+            atimes, self._atimes = self._atimes, {}
+            db = self._connect()
+            db.executemany('UPDATE media SET atime=? WHERE dev=? AND ino=? AND size=? AND '
+                           'mtime=? AND options=?', [ (t,) + k for k, t in atimes.items() ])
+            db.commit()
+
+
+    def evict(self):
+        """
+        Remove the least recently used entries above the cache limits.
+        """
+        with self._lock:
+            self._flush()
+            db = self._connect()
+            self._new = 0
+            db.execute('DELETE FROM failed WHERE ctime < ?', (time.time() - self.negative_ttl,))
+            if self.max_entries:
+                count = db.execute('SELECT COUNT(*) FROM media').fetchone()[0]
+                if count > self.max_entries:
+                    db.execute('DELETE FROM media WHERE rowid IN (SELECT rowid FROM media '
+                               'ORDER BY atime LIMIT ?)', (count - self.max_entries,))
+            if self.max_size:
+                size = db.execute('SELECT SUM(LENGTH(data)) FROM media').fetchone()[0] or 0
+                cursor = db.execute('SELECT rowid, LENGTH(data) FROM media ORDER BY atime')
+                remove = []
+                for rowid, length in cursor:
+                    if size <= self.max_size:
+                        break
+                    remove.append((rowid,))
+                    size -= length
+                db.executemany('DELETE FROM media WHERE rowid=?', remove)
+            db.commit()
+
+
+    def invalidate(self, parser=None):
+        """
+        Remove all entries created or tried by the given parser module or
+        the complete cache if parser is None.
+        """
+        with self._lock:
+            db = self._connect()
+            if parser is None:
+                db.execute('DELETE FROM media')
+                db.execute('DELETE FROM failed')
+            else:
+                db.execute('DELETE FROM media WHERE parser=?', (parser,))
+                db.execute("DELETE FROM failed WHERE ' ' || parsers LIKE ?",
+                           ('%% %s=%%' % parser,))
+            db.commit()
+
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._flush()
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
@@ -30,8 +30,11 @@
 # -----------------------------------------------------------------------------
 
 # python imports
+import os
 import re
+import mmap
 import logging
+import threading
 
 from . import fourcc
 from . import language
@@ -53,7 +56,7 @@ MEDIA_GAME      = 'MEDIA_GAME'
 
 MEDIACORE = ['title', 'caption', 'comment', 'size', 'type', 'subtype', 'timestamp',
              'keywords', 'country', 'language', 'langcode', 'url', 'media', 'artist',
-             'mime', 'datetime', 'tags', 'hash']
+             'mime', 'datetime', 'tags', 'hash', 'truncated', 'skipped']
 
 EXTENSION_DEVICE    = 'device'
 EXTENSION_DIRECTORY = 'directory'
@@ -71,8 +74,9 @@ _features = {
     # style of 'series 1x01 episode' and 'series s1e01 episode' where the
     # delimiter may not be a space but also point or minus.
     'VIDEO_SERIES_PARSER':
-        [ False, '(.+?)[\. _-]+[sS]?([0-9]|[0-9][0-9])[xeE]([0-9]|[0-9][0-9])[\. _-]+(.+)' ]
+        ( False, '(.+?)[\. _-]+[sS]?([0-9]|[0-9][0-9])[xeE]([0-9]|[0-9][0-9])[\. _-]+(.+)' )
 }
+_features_lock = threading.Lock()
 
 def enable_feature(var, value=None):
     """
@@ -81,9 +85,10 @@ def enable_feature(var, value=None):
     values but can be overwritten by setting the optional parameter
     value.
     """
-    _features[var][0] = True
-    if value:
-        _features[var][1] = value
+    # replace the tuple so parsers in other threads never see a
+    # feature enabled with the old value
+    with _features_lock:
+        _features[var] = True, value or _features[var][1]
 
 def features():
     """
@@ -103,6 +108,86 @@ def feature_config(feature):
     """
     return _features[feature][1]
 
+def wanted(file, name, *fields):
+    """
+    Return True if the parser reading file should parse the data for
+    the key name or one of the other keys given. The keys needed are
+    set by the fields argument of parse, a key of a stream like
+    'video.width' also needs 'width'. If the data is not wanted, name
+    is added to the keys skipped.
+    """
+    needed = getattr(file, 'fields', None)
+    if needed is None:
+        return True
+    for key in (name,) + fields:
+        for field in needed:
+            if field == key or field.startswith(key + '.') or field.endswith('.' + key):
+                return True
+    skipped = getattr(file, 'skipped', None)
+    if skipped is not None:
+        skipped.add(name)
+    return False
+
+def binary_ref(file, offset, length, transform=None):
+    """
+    Return length bytes at offset of the file for binary data like
+    cover art. For a file in the filesystem this is a BinaryRef read
+    when used, other files are read now. The optional transform is
+    called with the data. Returns None if the file has not all of it,
+    e.g. a buffer with a gap between head and tail.
+    """
+    try:
+        file.fileno()
+        path = os.path.abspath(file.name)
+    except (AttributeError, TypeError, ValueError, IOError):
+        path = None
+    if path and os.path.isfile(path):
+        return BinaryRef(path, offset, length, transform)
+    file.seek(offset)
+    data = file.read(length)
+    if len(data) < length:
+        log.info('binary data cut off: %d of %d bytes', len(data), length)
+        return None
+    if transform is not None:
+        data = transform(data)
+    return data
+
+def read_view(file, size):
+    """
+    Read up to size bytes from the file as memoryview. Files opened by
+    the factory return a view on the probe buffer or the memory map of
+    the file, so slicing the result does not copy the data.
+    """
+    if hasattr(file, 'read_view'):
+        return file.read_view(size)
+    return memoryview(file.read(size))
+
+def file_size(file):
+    """
+    Return the size of the file object. The file is not required to
+    exist in the filesystem, the position is not changed.
+    """
+    pos = file.tell()
+    size = file.seek(0, 2)
+    file.seek(pos, 0)
+    return size
+
+class _PerInstance(object):
+    """
+    Attribute of a Media object created on first access. It is stored
+    in the object and replaces this descriptor for that object.
+    """
+    def __init__(self, name, create):
+        self.name = name
+        self.create = create
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.create()
+        return value
+
+
 class Media(object):
     media = None
 
@@ -115,6 +200,21 @@ class Media(object):
     """
     _keys = MEDIACORE
     table_mapping = {}
+    # set by the factory if the parser stopped at the limits of parse
+    truncated = False
+
+    # Objects only store the attributes set. The keys default to None
+    # in the class (see _set_defaults) and tables and tags are created
+    # when used. The keys are also kept as dict in _keyset, shared with
+    # the class until _set adds a key.
+    tables = _PerInstance('tables', dict)
+    # Tags, unlike tables, are more well-defined dicts whose values are
+    # either Tag objects, other dicts (for nested tags), or lists of either
+    # (for multiple instances of the tag, e.g. actor).  Where possible,
+    # parsers should transform tag names to conform to the Official
+    # Matroska tags defined at http://www.matroska.org/technical/specs/tagging/index.html
+    # All tag names will be lower-cased.
+    tags = _PerInstance('tags', lambda: Tags())
 
     def __init__(self, hash=None):
         if hash is not None:
@@ -123,20 +223,41 @@ class Media(object):
                 if isinstance(value, list) and value and isinstance(value[0], dict):
                     value = [ Media(x) for x in value ]
                 self._set(key, value)
-            return
+            for key in self._lazy:
+                if key in self.__dict__ and not self.__dict__[key]:
+                    # empty tags are created when used
+                    del self.__dict__[key]
+
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._set_defaults()
+
 
-        self._keys = self._keys[:]
-        self.tables = {}
-        # Tags, unlike tables, are more well-defined dicts whose values are
-        # either Tag objects, other dicts (for nested tags), or lists of either
-        # (for multiple instances of the tag, e.g. actor).  Where possible,
-        # parsers should transform tag names to conform to the Official
-        # Matroska tags defined at http://www.matroska.org/technical/specs/tagging/index.html
-        # All tag names will be lower-cased.
-        self.tags = Tags()
-        for key in self._keys:
-            if key not in ('media', 'tags'):
-                setattr(self, key, None)
+    @classmethod
+    def _set_defaults(cls):
+        """
+        Set the keys of the class not defined otherwise to None and
+        create the key dict and the set of keys created when used.
+        """
+        cls._keyset = dict.fromkeys(cls._keys)
+        for key in cls._keys:
+            if not hasattr(cls, key):
+                setattr(cls, key, None)
+        cls._lazy = frozenset(k for k in cls._keys
+                              if isinstance(getattr(cls, k), _PerInstance))
+
+
+    @classmethod
+    def sniff(cls, head):
+        """
+        Return how sure the parser is that a file starting with the bytes
+        head has its format, from 0 (certainly not) to 1. None means the
+        parser can't tell without parsing the file. This is only used for
+        files not detected by extension or magic header, a parser that
+        needs the extension can return 0.
+        """
+        return None
 
 
     #
@@ -144,13 +265,17 @@ class Media(object):
     #
 
     def __str__(self):
-        result = ''
+        result = []
 
         # print normal attributes
         lists = []
-        for key in self._keys:
+        lazy = self._lazy
+        for key in self._keyset:
+            if key in lazy:
+                # dicts printed below, not created if not used yet
+                continue
             value = getattr(self, key, None)
-            if value == None or key == 'url':
+            if value == None or key == 'url' or (key == 'truncated' and not value):
                 continue
             if isinstance(value, list):
                 if not value:
@@ -166,22 +291,20 @@ class Media(object):
                 continue
             if key in UNPRINTABLE_KEYS:
                 value = '<unprintable data, size=%d>' % len(value)
-            result += '| %10s: %s\n' % (str(key), str(value))
+            result.append('| %10s: %s\n' % (str(key), str(value)))
 
         # print tags (recursively, to support nested tags).
         def print_tags(tags, suffix, show_label):
-            result = ''
             for n, (name, tag) in enumerate(tags.items()):
-                result += '| %12s%s%s = ' % ('tags: ' if n == 0 and show_label else '', suffix, name)
+                result.append('| %12s%s%s = ' % ('tags: ' if n == 0 and show_label else '', suffix, name))
                 if isinstance(tag, list):
                     # TODO: doesn't support lists/dicts within lists.
-                    result += '%s\n' % ', '.join(subtag.value for subtag in tag)
+                    result.append('%s\n' % ', '.join(subtag.value for subtag in tag))
                 else:
-                    result += '%s\n' % (tag.value or '')
+                    result.append('%s\n' % (tag.value or ''))
                 if isinstance(tag, dict):
-                    result += print_tags(tag, '    ', False)
-            return result
-        result += print_tags(self.tags, '', True)
+                    print_tags(tag, '    ', False)
+        print_tags(self.__dict__.get('tags', {}), '', True)
 
         # print lists
         for key, l in lists:
@@ -189,13 +312,13 @@ class Media(object):
                 label = '+-- ' + key.rstrip('s').capitalize()
                 if key not in ('tracks', 'subtitles', 'chapters'):
                     label += ' Track'
-                result += '%s #%d\n' % (label, n+1)
-                result += '|    ' + re.sub(r'\n(.)', r'\n|    \1', str(item))
+                result.append('%s #%d\n' % (label, n+1))
+                result.append('|    ' + re.sub(r'\n(.)', r'\n|    \1', str(item)))
 
         # print tables
         if log.level >= 10:
-            for name, table in list(self.tables.items()):
-                result += '+-- Table %s\n' % str(name)
+            for name, table in list(self.__dict__.get('tables', {}).items()):
+                result.append('+-- Table %s\n' % str(name))
                 for key, value in list(table.items()):
                     try:
                         value = str(value)
@@ -206,8 +329,8 @@ class Media(object):
                             value = '<unprintable data, size=%d>' % len(value)
                         except AttributeError:
                             value = '<unprintable data>'
-                    result += '|    | %s: %s\n' % (str(key), value)
-        return result
+                    result.append('|    | %s: %s\n' % (str(key), value))
+        return ''.join(result)
 
 
     def __repr__(self):
@@ -237,16 +360,19 @@ class Media(object):
 
     def _set(self, key, value):
         """
-        Set key to value and add the key to the internal keys list if
-        missing.
+        Set key to value and add the key to the internal keys if
+        missing. Strings are cleaned up like in _finalize.
         """
         if value is None and getattr(self, key, None) is None:
             return
-        if isinstance(value, str):
-            value = utils.tostr(value)
+        if isinstance(value, str) and key not in UNPRINTABLE_KEYS and key != 'image':
+            value = value.strip().replace('\0', '')
         setattr(self, key, value)
-        if not key in self._keys:
-            self._keys.append(key)
+        if key not in self._keyset:
+            if '_keyset' not in self.__dict__:
+                # copy the dict shared with the class
+                self._keyset = dict(self._keyset)
+            self._keyset[key] = None
 
     def _set_url(self, url):
         """
@@ -258,9 +384,10 @@ class Media(object):
         """
         Correct same data based on specific rules
         """
-        # make sure all strings are unicode
-        for key in self._keys:
-            if key in UNPRINTABLE_KEYS:
+        # clean up strings not set with _set
+        lazy = self._lazy
+        for key in self._keyset:
+            if key in UNPRINTABLE_KEYS or key in lazy:
                 continue
             value = getattr(self, key)
             if value is None:
@@ -270,15 +397,15 @@ class Media(object):
                     setattr(self, key, utils.tobytes(value))
                 continue
             if isinstance(value, str):
-                setattr(self, key, utils.tostr(value))
-            if isinstance(value, str):
-                setattr(self, key, value.strip().rstrip().replace('\0', ''))
-            if isinstance(value, list) and value and isinstance(value[0], Media):
+                clean = value.strip().replace('\0', '')
+                if clean != value:
+                    setattr(self, key, clean)
+            elif isinstance(value, list) and value and isinstance(value[0], Media):
                 for submenu in value:
                     submenu._finalize()
 
         # copy needed tags from tables
-        for name, table in list(self.tables.items()):
+        for name, table in list(self.__dict__.get('tables', {}).items()):
             mapping = self.table_mapping.get(name, {})
             for tag, attr in list(mapping.items()):
                 if self.get(attr):
@@ -286,17 +413,15 @@ class Media(object):
                 value = table.get(tag, None)
                 if value is not None:
                     if not isinstance(value, str):
-                        value = utils.tostr(str(value))
-                    elif isinstance(value, str):
-                        value = utils.tostr(value)
-                    value = value.strip().rstrip().replace('\0', '')
+                        value = str(value)
+                    value = value.strip().replace('\0', '')
                     setattr(self, attr, value)
 
-        if 'fourcc' in self._keys and 'codec' in self._keys and self.codec is not None:
+        if 'fourcc' in self._keyset and 'codec' in self._keyset and self.codec is not None:
             # Codec may be a fourcc, in which case we resolve it to its actual
             # name and set the fourcc attribute.
             self.fourcc, self.codec = fourcc.resolve(self.codec)
-        if 'language' in self._keys:
+        if 'language' in self._keyset:
             self.langcode, self.language = language.resolve(self.language)
 
 
@@ -345,8 +470,15 @@ class Media(object):
         Convert Media to dict.
         """
         result = {}
-        for k in self._keys:
-            value = getattr(self, k, None)
+        values, lazy = self.__dict__, self._lazy
+        for k in self._keyset:
+            if k in values:
+                value = values[k]
+            elif k in lazy:
+                # an empty dict if not used yet, do not create it
+                value = {}
+            else:
+                value = getattr(self, k, None)
             if isinstance(value, list) and value and isinstance(value[0], Media):
                 value = [ x.convert() for x in value ]
             result[k] = value
@@ -357,7 +489,10 @@ class Media(object):
         """
         Return all keys for the attributes set by the parser.
         """
-        return self._keys
+        return list(self._keyset)
+
+
+Media._set_defaults()
 
 
 class Collection(Media):
@@ -371,6 +506,113 @@ class Collection(Media):
         self.tracks = []
 
 
+class BinaryRef(object):
+    """
+    Binary data stored in a file, e.g. cover art or an attachment. The
+    data is read on first access with bytes(), data() or view(). It can
+    be used like the bytes it replaces: indexing, slicing and the bytes
+    methods work on the data and with Python 3.12 or newer it supports
+    the buffer protocol (older versions need bytes() for functions like
+    file.write). Only the reference is pickled, a transform must be
+    picklable (e.g. a module level function).
+    """
+    def __init__(self, path, offset, length, transform=None):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.transform = transform
+        self._data = None
+
+
+    def view(self):
+        """
+        Return the raw data as memoryview on a memory map of the file
+        without copying it. The transform is not applied.
+        """
+        with open(self.path, 'rb') as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(m)[self.offset:self.offset+self.length]
+
+
+    def data(self):
+        """
+        Return the data as bytes.
+        """
+        if self._data is None:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(self.length)
+            if self.transform is not None:
+                data = self.transform(data)
+            self._data = data
+        return self._data
+
+
+    def __bytes__(self):
+        return self.data()
+
+
+    def __buffer__(self, flags):
+        return memoryview(self.data())
+
+
+    def __release_buffer__(self, view):
+        view.release()
+
+
+    def __getitem__(self, key):
+        return self.data()[key]
+
+
+    def __iter__(self):
+        return iter(self.data())
+
+
+    def __contains__(self, item):
+        return item in self.data()
+
+
+    def __getattr__(self, attr):
+        # bytes methods like startswith or hex, not called for the
+        # attributes set in __init__
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.data(), attr)
+
+
+    def __len__(self):
+        if self.transform is None:
+            return self.length
+        return len(self.data())
+
+
+    def __bool__(self):
+        return self.length > 0
+
+
+    def __eq__(self, other):
+        if isinstance(other, BinaryRef):
+            return (self.path, self.offset, self.length, self.transform) == \
+                   (other.path, other.offset, other.length, other.transform)
+        if isinstance(other, (bytes, bytearray, memoryview)):
+            return self.data() == other
+        return NotImplemented
+
+
+    def __hash__(self):
+        return hash((self.path, self.offset, self.length))
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_data'] = None
+        return state
+
+
+    def __repr__(self):
+        return '<BinaryRef %s offset=%d length=%d>' % (self.path, self.offset, self.length)
+
+
 class Tag(object):
     """
     An individual tag, which will be a value stored in a Tags object.
@@ -432,3 +674,26 @@ class Tags(dict, Tag):
         self.value = value
         self.langcode = langcode
         self.binary = False
+
+
+def jsonable(value):
+    """
+    Convert a value from Media.convert() to JSON types. Binary data is
+    replaced by its size.
+    """
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview, BinaryRef)):
+        return '<unprintable data, size=%d>' % len(value)
+    if isinstance(value, Tags):
+        tags = dict((str(k), jsonable(v)) for k, v in value.items())
+        if value.value is None:
+            return tags
+        return { 'value': jsonable(value.value), 'tags': tags }
+    if isinstance(value, Tag):
+        return jsonable(value.value)
+    if isinstance(value, dict):
+        return dict((str(k), jsonable(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [ jsonable(v) for v in value ]
+    return str(value)
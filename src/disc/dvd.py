@@ -116,6 +116,12 @@ class DVDInfo(core.Disc):
     """
     _keys = core.Disc._keys + [ 'length' ]
 
+    @classmethod
+    def sniff(cls, head):
+        # every ISO 9660 image has this, not only DVDs
+        return 0.5 if head[32769:32774] == b'CD001' else None
+
+
     def __init__(self, device):
         core.Disc.__init__(self)
         self.offset = 0
@@ -29,17 +29,24 @@
 #
 # -----------------------------------------------------------------------------
 
-__all__ = [ 'Factory', 'register', 'gettype', 'parse' ]
+__all__ = [ 'Factory', 'register', 'gettype', 'parse', 'parse_many',
+            'parse_bytes', 'parse_buffer', 'enable_cache', 'disable_cache',
+            'enable_dispatch_stats', 'disable_dispatch_stats', 'dispatch_stats',
+            'ParseStats' ]
 
 # python imports
 import stat
 import io
+import mmap
 import os
 import sys
-import struct
-import urllib.parse
-import urllib.request, urllib.parse, urllib.error
 import logging
+import time
+import queue
+import collections
+import importlib
+import zlib
+import threading
 
 # kaa.metadata imports
 from . import core
@@ -50,16 +57,37 @@ log = logging.getLogger('metadata')
 # factory object
 _factory = None
 
-# some timing debug
+# result cache, see enable_cache
+_cache = None
+
+# parser hits and misses by extension, see enable_dispatch_stats
+_dispatch = None
+
+# log ParseStats of every parse
 TIME_DEBUG = False
 
+# entry point group of parser plugins, set to None to disable them. A
+# plugin entry point is a callable that gets the register function and
+# registers its parsers as 'module:class' names.
+PLUGIN_GROUP = 'kaa.metadata.parsers'
+
+# number of bytes read once from the beginning of a file and shared
+# between all parsers trying to detect it
+PROBE_SIZE = 131072
+
+# map files into memory and serve reads beyond the probe buffer from
+# the map. Parsers reading with core.read_view get views on the map.
+USE_MMAP = False
+
 R_MIMETYPE  = 0
 R_EXTENSION = 1
 R_CLASS     = 2
 
 def register(mimetype, extensions, c, magic=None):
     """
-    Register a parser to the factory.
+    Register a parser to the factory. The parser c is given by name, see
+    _Factory.get_class. The optional magic is the header of the file
+    format, see MagicIndex.add for the possible values.
     """
     return Factory().register(mimetype, extensions, c, magic)
 
@@ -71,21 +99,468 @@ def gettype(mimetype, extensions):
     return Factory().get(mimetype,extensions)
 
 
-def parse(filename, force=True):
+def enable_cache(path=None, max_entries=1000000, max_size=None, negative_ttl=None):
+    """
+    Cache the results of parse for regular files in a sqlite database
+    at path (default: in the kaa-metadata temp directory). Unchanged
+    files are not parsed again. Files no parser accepts are remembered
+    for negative_ttl seconds (default: a week).
+    """
+    global _cache
+    from .cache import Cache, NEGATIVE_TTL
+    disable_cache()
+    if negative_ttl is None:
+        negative_ttl = NEGATIVE_TTL
+    _cache = Cache(path, max_entries, max_size, negative_ttl)
+    # write the access times of the cache hits
+    import atexit
+    atexit.register(_cache.close)
+    return _cache
+
+
+def disable_cache():
+    """
+    Stop using the result cache
+    """
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def enable_dispatch_stats(path=None, reorder=True):
+    """
+    Count hits and misses of the parsers tried for each file extension.
+    If reorder is True, the parsers with the best hit rate for an
+    extension are tried first. The counters are loaded from and saved
+    to the json file at path if given.
+    """
+    global _dispatch
+    disable_dispatch_stats()
+    _dispatch = DispatchStats(path, reorder)
+    if path:
+        import atexit
+        atexit.register(_dispatch.save)
+    return _dispatch
+
+
+def disable_dispatch_stats():
+    """
+    Stop counting parser hits and misses and save the counters.
+    """
+    global _dispatch
+    if _dispatch is not None and _dispatch.path:
+        _dispatch.save()
+    _dispatch = None
+
+
+def dispatch_stats():
+    """
+    Return the DispatchStats object or None if disabled.
+    """
+    return _dispatch
+
+
+def parse(filename, force=True, stats=None, fingerprint='opensubtitles',
+          max_bytes=None, max_seconds=None, cancel=None, fields=None):
     """
     parse a file
+
+    If stats is True, a ParseStats object describing the parsing is
+    stored as parse_stats in the result. If stats is callable, it is
+    called with the ParseStats object, also when parsing failed.
+
+    The hash of a file is created with the given fingerprint method
+    ('opensubtitles', 'partial' or 'full', see kaa.metadata.fingerprint).
+    None skips hashing the file.
+
+    max_bytes limits the bytes the parsers read from the file and
+    max_seconds the time they spend on it. If a limit is reached, the
+    parser gets no more data and the result has truncated set to True.
+    cancel is a threading.Event, once it is set the parse stops at the
+    next read from the file like when the time is up.
+
+    fields is a set of the keys needed, e.g. {'length', 'video.width'}.
+    Parsers may skip parts of the file not needed for these keys and
+    the hash is only created if 'hash' is in fields. The keys skipped
+    are listed in skipped of the result.
+    """
+    budget = None
+    if max_bytes is not None or max_seconds is not None or cancel is not None:
+        budget = Budget(max_bytes, max_seconds, cancel)
+    if fields is not None:
+        fields = frozenset(fields)
+    if stats or TIME_DEBUG:
+        info = ParseStats(getattr(filename, 'name', filename))
+        result = _parse(filename, force, info, fingerprint, budget, fields)
+        info.done()
+        if TIME_DEBUG:
+            log.info('%s', info)
+        if result and stats:
+            result.parse_stats = info
+        if callable(stats):
+            stats(info)
+        return result
+    return _parse(filename, force, None, fingerprint, budget, fields)
+
+
+def parse_bytes(head, tail=None, total_size=None, name='', force=True, stats=None,
+                fingerprint='opensubtitles', max_bytes=None, max_seconds=None,
+                fields=None):
     """
-    result = Factory().create(filename, force)
+    parse a file from memory
+
+    head are the first bytes of the file and tail the optional last
+    bytes, total_size is the size of the complete file. Parsers reading
+    between head and tail get a short read. The name is only used to
+    guess the type by its extension. The other arguments are the same as
+    for parse. The hash is only set if head and tail contain the data
+    needed by the fingerprint method.
+    """
+    return parse(BufferFile(head, tail, total_size, name), force, stats, fingerprint,
+                 max_bytes, max_seconds, fields=fields)
+
+
+def parse_buffer(buffer, name='', force=True, stats=None, fingerprint='opensubtitles',
+                 max_bytes=None, max_seconds=None, fields=None):
+    """
+    parse a complete file given as bytes-like object, e.g. a memoryview
+    """
+    return parse(BufferFile(buffer, name=name), force, stats, fingerprint,
+                 max_bytes, max_seconds, fields=fields)
+
+
+def _parse(filename, force, stats=None, fingerprint='opensubtitles', budget=None,
+           fields=None, st=None):
+    cache, cache_st = _cache, None
+    if cache is not None and isinstance(filename, str) and filename.find('://') <= 0:
+        if st is None:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                pass
+        if st is not None and stat.S_ISREG(st.st_mode):
+            cache_st = st
+            # results differ by the options used
+            options = 'fingerprint=%s' % fingerprint
+            if fields is not None:
+                options += ' fields=%s' % ','.join(sorted(fields))
+            info = cache.get(st, options, os.path.abspath(filename))
+            if info is not None:
+                if stats is not None:
+                    stats.cached = True
+                # the entry may be for another name of the same file
+                scheme = (info.get('url') or 'file').split('://')[0]
+                info['url'] = '%s://%s' % (scheme, os.path.abspath(filename))
+                return core.Media(info)
+            # files no parser accepted depend on the parsers available
+            failed = 'force=%d types=%s' % (bool(force), Factory().signature())
+            if cache.get_failed(st, failed):
+                if stats is not None:
+                    stats.cached = True
+                return None
+            if stats is None:
+                # the parsers tried are needed for the negative cache
+                stats = ParseStats(filename)
+    method = fingerprint
+    if fields is not None and 'hash' not in fields:
+        method = None
+    result = Factory().create(filename, force, stats, method, budget, fields, st)
     if result:
+        if method != fingerprint:
+            result._set('skipped', sorted(set(result.get('skipped') or ()) | { 'hash' }))
         result._finalize()
+        if cache_st is not None and not result.get('truncated'):
+            cache.set(cache_st, result.convert(), result.__class__.__module__, options,
+                      os.path.abspath(filename))
+    elif cache_st is not None and stats.attempts and not stats.errors and \
+             (budget is None or not budget.truncated):
+        # only remember files the parsers rejected, not I/O errors or
+        # parser crashes
+        parsers = [ Factory().get_module(a[0]) for a in stats.attempts ]
+        cache.set_failed(cache_st, parsers, failed)
     return result
 
 
+def _parse_chunk(filenames, force, fingerprint, stats=False):
+    """
+    Worker function for parse_many: parse the given files and return
+    picklable (filename, dict) tuples or (filename, dict, ParseStats)
+    tuples if stats is True.
+    """
+    results = []
+    for filename in filenames:
+        if stats:
+            collected = []
+            info = parse(filename, force, collected.append, fingerprint)
+            results.append((filename, info.convert() if info else None, collected[0]))
+        else:
+            info = parse(filename, force, fingerprint=fingerprint)
+            results.append((filename, info.convert() if info else None))
+    return results
+
+
+def parse_many(filenames, workers=None, chunksize=1, timeout=60, force=True,
+               fingerprint='opensubtitles', stats=False):
+    """
+    Parse many files in a pool of worker processes. The results are
+    yielded as (filename, info) tuples in the order the parsing
+    finishes, info is the dict from Media.convert() (use Media(info) to
+    get an object back) or None if the file could not be parsed. If
+    stats is True, (filename, info, ParseStats) tuples are yielded, the
+    ParseStats is None for files of a crashed or hanging worker.
+
+    A chunk of files not done after timeout seconds per file is treated
+    as a crashed or hanging worker. The pool is restarted, the files of
+    that chunk are retried one by one and a file that fails alone is
+    returned as None.
+    """
+    import multiprocessing
+    workers = workers or os.cpu_count() or 1
+    filenames = iter(filenames)
+    retry = collections.deque()
+    done = queue.Queue()
+    pool = None
+    # generation of the pool, callbacks from a terminated pool are ignored
+    generation = 0
+    pending = {}
+    try:
+        while True:
+            if pool is None:
+                generation += 1
+                pool = multiprocessing.Pool(workers)
+            # keep one chunk per worker in flight so the deadline of
+            # a chunk starts when a worker picks it up
+            while len(pending) < workers:
+                if retry:
+                    chunk = retry.popleft()
+                else:
+                    chunk = [ f for _, f in zip(range(chunksize), filenames) ]
+                    if not chunk:
+                        break
+                key = object()
+                pending[key] = chunk, time.monotonic() + timeout * len(chunk)
+                pool.apply_async(_parse_chunk, (chunk, force, fingerprint, stats),
+                    callback=lambda r, g=generation, k=key: done.put((g, k, r)),
+                    error_callback=lambda e, g=generation, k=key: done.put((g, k, e)))
+            if not pending:
+                break
+            deadline = min(d for _, d in pending.values())
+            try:
+                g, key, results = done.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                g = generation
+                key = min(pending, key=lambda k: pending[k][1])
+                results = None
+            if g != generation or key not in pending:
+                continue
+            chunk, _ = pending.pop(key)
+            if isinstance(results, list):
+                yield from results
+                continue
+            # The chunk failed or timed out. Kill the pool (the worker may
+            # hang) and send the other chunks again.
+            log.warning('parsing %s failed: %s', chunk, results or 'timeout')
+            pool.terminate()
+            pool = None
+            retry.extend(c for c, _ in pending.values())
+            pending.clear()
+            if len(chunk) == 1:
+                yield (chunk[0], None, None) if stats else (chunk[0], None)
+            else:
+                retry.extend([ f ] for f in chunk)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+class ParseStats(object):
+    """
+    Information about one parse call: the parsers tried with wall and
+    cpu time and success of each attempt and the I/O done on the file.
+    bytes_read, reads, seeks and max_read count the calls of the
+    parsers, disk_bytes the bytes read from the real file. errors has
+    (parser, message) for exceptions other than ParseError, e.g. I/O
+    errors, the parser is None if the error was not in a parser.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.attempts = []
+        self.errors = []
+        self.cached = False
+        self.bytes_read = 0
+        self.reads = 0
+        self.seeks = 0
+        self.max_read = 0
+        self.disk_bytes = 0
+        self.wall = self.cpu = 0.0
+        self._start = time.perf_counter(), time.process_time()
+
+
+    def attempt(self, parser, wall, cpu, ok):
+        """
+        Add a parser attempt.
+        """
+        self.attempts.append((parser, wall, cpu, ok))
+
+
+    def error(self, parser, e):
+        """
+        Add an exception other than ParseError.
+        """
+        self.errors.append((parser, '%s: %s' % (e.__class__.__name__, e)))
+
+
+    def done(self):
+        """
+        Set the total wall and cpu time.
+        """
+        self.wall = time.perf_counter() - self._start[0]
+        self.cpu = time.process_time() - self._start[1]
+
+
+    def __str__(self):
+        attempts = ', '.join('%s%s %.1fms' % (p, '' if ok else ' failed', wall * 1000)
+                             for p, wall, cpu, ok in self.attempts)
+        return '%s: %.1fms (cpu %.1fms)%s, %d reads (%d bytes, max %d), ' \
+               '%d seeks, %d bytes from disk; %s' % \
+               (self.name, self.wall * 1000, self.cpu * 1000, ' cached' if self.cached else '',
+                self.reads, self.bytes_read, self.max_read, self.seeks, self.disk_bytes,
+                attempts or 'no parser tried') + \
+               ''.join('; %s error %s' % (p or 'parse', e) for p, e in self.errors)
+
+
+    def __repr__(self):
+        return '<ParseStats %s>' % self
+
+
 class NullParser(object):
     def __init__(self, file):
         raise core.ParseError
 
 
+class DispatchStats(object):
+    """
+    Hits and misses of the parsers tried by file extension with the
+    time spent on the misses. With reorder, the parsers registered for
+    an extension are tried by their hit rate.
+    """
+    def __init__(self, path=None, reorder=True):
+        self.path = path
+        self.reorder = reorder
+        # extension -> parser -> [hits, misses, seconds spent on misses]
+        self.counters = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+
+    def add(self, ext, parser, ok, seconds):
+        """
+        Count a parser attempt for the extension.
+        """
+        with self._lock:
+            c = self.counters.setdefault(ext, {}).setdefault(parser, [0, 0, 0.0])
+            if ok:
+                c[0] += 1
+            else:
+                c[1] += 1
+                c[2] += seconds
+
+
+    def order(self, ext, parsers):
+        """
+        Return the parser tuples for the extension in the order to try.
+        """
+        counters = self.counters.get(ext)
+        if not self.reorder or not counters or len(parsers) < 2:
+            return parsers
+        def rate(e):
+            hits, misses = counters.get(e[R_CLASS], (0, 0))[:2]
+            return -(hits + 1.0) / (hits + misses + 2)
+        return sorted(parsers, key=rate)
+
+
+    def misses(self):
+        """
+        Return (seconds, ext, parser, hits, misses) tuples of all
+        parsers that missed, the most expensive first.
+        """
+        with self._lock:
+            result = [ (c[2], ext, parser, c[0], c[1])
+                       for ext, parsers in self.counters.items()
+                       for parser, c in parsers.items() if c[1] ]
+        return sorted(result, reverse=True)
+
+
+    def load(self):
+        import json
+        try:
+            with open(self.path) as f:
+                self.counters = json.load(f)
+        except (IOError, ValueError) as e:
+            log.warning('unable to load dispatch stats %s: %s', self.path, e)
+
+
+    def save(self):
+        import json
+        with self._lock:
+            data = json.dumps(self.counters)
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except (IOError, OSError) as e:
+            log.warning('unable to save dispatch stats %s: %s', self.path, e)
+
+
+class Budget(object):
+    """
+    Limits of one parse call: at most max_bytes are read from the file
+    and no parser reads after max_seconds or after the cancel event is
+    set. Reads beyond the limits return no data and truncated is set if
+    data may be missing.
+    """
+    def __init__(self, max_bytes=None, max_seconds=None, cancel=None):
+        self.max_bytes = max_bytes
+        self.deadline = None
+        if max_seconds is not None:
+            self.deadline = time.monotonic() + max_seconds
+        self.cancel = cancel
+        self.truncated = False
+
+
+    def expired(self):
+        """
+        Return True if the time is up or the parse was cancelled.
+        """
+        if (self.deadline is not None and time.monotonic() > self.deadline) or \
+               (self.cancel is not None and self.cancel.is_set()):
+            self.truncated = True
+            return True
+        return False
+
+
+    def limit(self, size):
+        """
+        Return how many of size bytes (-1 for all) may be read.
+        """
+        if self.expired():
+            return 0
+        if self.max_bytes is None or 0 <= size <= self.max_bytes:
+            return size
+        return self.max_bytes
+
+
+    def used(self, size):
+        """
+        Count size bytes read from the file.
+        """
+        if self.max_bytes is not None:
+            self.max_bytes = max(0, self.max_bytes - size)
+
+
 class File(io.FileIO):
     def read(self, bytes=-1):
         """
@@ -93,10 +568,387 @@ class File(io.FileIO):
         reached. If more than 5MB is requested, an IOError is
         raised. This should not mappen for kaa.metadata parsers.
         """
-        if bytes > 5000000 or (bytes < 0 and os.stat(self.name)[stat.ST_SIZE] - self.tell() > 1000000):
+        self.check_read(bytes, self.tell())
+        return super().read(bytes)
+
+
+    def check_read(self, bytes, pos):
+        """
+        Raise IOError if reading bytes at pos looks like a bug, see read.
+        Reads from the memory map are checked with this too.
+        """
+        if bytes > 5000000 or (bytes < 0 and os.stat(self.name)[stat.ST_SIZE] - pos > 1000000):
             # reading more than 1MB looks like a bug
             raise IOError('trying to read %s bytes' % bytes)
-        return super().read(bytes)
+
+
+    def mmap(self):
+        """
+        Return a read only memory map of the file or None if the file
+        can not be mapped.
+        """
+        if getattr(self, '_map', None) is None:
+            try:
+                self._map = mmap.mmap(self.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty files and some special files can not be mapped
+                self._map = False
+        return self._map or None
+
+
+    def close(self):
+        """
+        Close the file and its memory map.
+        """
+        if getattr(self, '_map', None):
+            try:
+                self._map.close()
+            except BufferError:
+                # a parser still holds a view, the map is unmapped
+                # when the last view is gone
+                log.debug('memory map of %s still in use', self.name)
+        self._map = None
+        super().close()
+
+
+class BufferFile(object):
+    """
+    Read only file on bytes in memory. The file of total_size bytes
+    starts with head and ends with the optional tail. The data between
+    them is missing, reads stop at the end of head and reads in the gap
+    return no data.
+    """
+    def __init__(self, head, tail=None, total_size=None, name=''):
+        self.head = memoryview(head).cast('B')
+        self.tail = memoryview(tail if tail is not None else b'').cast('B')
+        if total_size is None:
+            if tail is not None:
+                raise ValueError('total_size is needed for the tail')
+            total_size = len(self.head)
+        if total_size < len(self.head) or total_size < len(self.tail):
+            raise ValueError('total_size smaller than head or tail')
+        self.size = total_size
+        # offset of the tail in the file
+        self.tail_start = total_size - len(self.tail)
+        self.name = name
+        self.closed = False
+        self._pos = 0
+
+
+    def available(self, offset, size):
+        """
+        Return True if the size bytes at offset are in head or tail.
+        """
+        return offset + size <= len(self.head) or \
+               (offset >= self.tail_start and offset + size <= self.size)
+
+
+    def read_view(self, size=-1):
+        """
+        Read up to size bytes as memoryview on head or tail.
+        """
+        pos = self._pos
+        if pos < len(self.head):
+            data = self.head[pos:]
+        elif pos >= self.tail_start:
+            data = self.tail[pos-self.tail_start:]
+        else:
+            data = self.head[:0]
+        if size is not None and size >= 0:
+            data = data[:size]
+        self._pos = pos + len(data)
+        return data
+
+
+    def read(self, size=-1):
+        return bytes(self.read_view(size))
+
+
+    def readinto(self, buffer):
+        data = self.read_view(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+    def readline(self, size=-1):
+        pos = self._pos
+        data = self.read_view(size)
+        end = bytes(data).find(b'\n') + 1
+        if end:
+            data = data[:end]
+            self._pos = pos + end
+        return bytes(data)
+
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+        if offset < 0:
+            raise IOError('invalid seek position %s' % offset)
+        self._pos = offset
+        return offset
+
+
+    def tell(self):
+        return self._pos
+
+
+    def close(self):
+        self.closed = True
+
+
+class ProbeFile(object):
+    """
+    File-like wrapper around a seekable file. The first PROBE_SIZE bytes
+    are read once and every parser trying to detect the file is served
+    from that buffer. Only reads beyond the buffer go back to the real
+    file.
+    """
+    def __init__(self, file, size=None, stats=None, budget=None, fields=None):
+        if size is None:
+            size = PROBE_SIZE
+        self.file = file
+        self.name = getattr(file, 'name', '')
+        # ParseStats object counting the I/O or None
+        self.stats = stats
+        # Budget limiting the reads or None
+        self.budget = budget
+        # keys needed (None for all) and the keys the parser skipped,
+        # see core.wanted
+        self.fields = fields
+        self.skipped = set()
+        if budget is not None and budget.max_bytes is not None:
+            size = min(size, budget.max_bytes)
+        # memory map of the file if USE_MMAP is set
+        self.map = None
+        if USE_MMAP and hasattr(file, 'mmap'):
+            self.map = file.mmap()
+        if self.map is not None:
+            self.head = self.map[:size]
+        else:
+            file.seek(0, 0)
+            self.head = file.read(size)
+        if stats is not None:
+            stats.disk_bytes += len(self.head)
+        if budget is not None:
+            budget.used(len(self.head))
+        # if the file is smaller than the probe, the buffer has it all
+        self.complete = len(self.head) < size
+        self._pos = 0
+
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes, from the probe buffer if possible.
+        """
+        pos, head = self._pos, self.head
+        if size is None:
+            size = -1
+        if 0 <= size <= len(head) - pos:
+            data = head[pos:pos+size]
+        elif pos < len(head):
+            data = head[pos:]
+            if not self.complete:
+                # the read starts in the buffer but ends after it
+                data += self._read_file(len(head), size - len(data) if size >= 0 else -1)
+        elif self.complete:
+            data = head[:0]
+        else:
+            data = self._read_file(pos, size)
+        self._pos = pos + len(data)
+        if self.stats is not None:
+            self._count_read(len(data))
+        return data
+
+
+    def _read_file(self, pos, size):
+        """
+        Read up to size bytes at pos from the file or its memory map
+        within the budget.
+        """
+        wanted, budget = size, self.budget
+        if budget is not None:
+            size = budget.limit(size)
+        if self.map is not None:
+            # the same limits as reading from the file
+            self.file.check_read(size, pos)
+            data = self.map[pos:] if size < 0 else self.map[pos:pos+size]
+        else:
+            self.file.seek(pos, 0)
+            data = self.file.read(size)
+        self._count_disk(len(data))
+        if budget is not None:
+            budget.used(len(data))
+            if size != wanted and len(data) == size:
+                # the file may have more data
+                budget.truncated = True
+        return data
+
+
+    def read_view(self, size):
+        """
+        Read up to size bytes as memoryview. The view is on the memory
+        map or the probe buffer if possible, slicing it copies nothing.
+        """
+        pos, head = self._pos, self.head
+        if self.map is not None and self.budget is None:
+            data = memoryview(self.map)[pos:pos+size]
+            self._count_disk(max(0, pos + len(data) - max(pos, len(head))))
+        elif pos + size <= len(head) or self.complete:
+            data = memoryview(head)[pos:pos+size]
+        else:
+            return memoryview(self.read(size))
+        self._pos = pos + len(data)
+        if self.stats is not None:
+            self._count_read(len(data))
+        return data
+
+
+    def _count_read(self, size):
+        stats = self.stats
+        stats.reads += 1
+        stats.bytes_read += size
+        if size > stats.max_read:
+            stats.max_read = size
+
+
+    def _count_disk(self, size):
+        if self.stats is not None:
+            self.stats.disk_bytes += size
+
+
+    def seek(self, offset, whence=0):
+        """
+        Move the read position. Nothing is read from the real file.
+        """
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            if self.map is not None:
+                offset += len(self.map)
+            elif self.complete:
+                offset += len(self.head)
+            else:
+                self.file.seek(0, 2)
+                offset += self.file.tell()
+        if offset < 0:
+            raise IOError('invalid seek position %s' % offset)
+        if self.stats is not None:
+            self.stats.seeks += 1
+        self._pos = offset
+        return offset
+
+
+    def tell(self):
+        return self._pos
+
+
+    def readline(self, size=-1):
+        """
+        Read one line, from the probe buffer if possible.
+        """
+        pos, head = self._pos, self.head
+        end = head.find(b'\n', pos) + 1
+        if end and (size is None or size < 0 or end - pos <= size):
+            return self.read(end - pos)
+        if 0 <= pos < len(head) and size is not None and 0 <= size <= len(head) - pos:
+            return self.read(size)
+        if self.complete:
+            return self.read(size)
+        if self.map is not None:
+            end = self.map.find(b'\n', pos) + 1 or len(self.map)
+            if size is not None and 0 <= size < end - pos:
+                end = pos + size
+            return self.read(max(0, end - pos))
+        if self.budget is not None:
+            size = self.budget.limit(-1 if size is None else size)
+        self.file.seek(pos, 0)
+        data = self.file.readline(size)
+        self._pos = pos + len(data)
+        self._count_disk(len(data))
+        if self.budget is not None:
+            self.budget.used(len(data))
+        if self.stats is not None:
+            self._count_read(len(data))
+        return data
+
+
+    def __getattr__(self, attr):
+        return getattr(self.file, attr)
+
+
+class MagicIndex(object):
+    """
+    Index of the magic headers of all parsers. A magic header is a
+    sequence of (offset, bytes) conditions that all have to match. The
+    first condition of each header is stored in a prefix trie for its
+    offset, so the head of a file is matched against all headers by
+    walking each trie once.
+    """
+    def __init__(self):
+        # offset -> trie, a trie node is a dict byte -> node. The key
+        # None holds the headers ending at that node.
+        self.tries = {}
+        self.count = 0
+
+
+    def add(self, magic, value):
+        """
+        Add a magic header. It is either bytes found at the beginning of
+        the file, an (offset, bytes) tuple, a tuple of such tuples that
+        must all match or a list of alternatives.
+        """
+        if isinstance(magic, list):
+            for m in magic:
+                self.add(m, value)
+            return
+        if isinstance(magic, str):
+            magic = magic.encode('latin-1')
+        if isinstance(magic, bytes):
+            magic = ((0, magic),)
+        elif isinstance(magic[0], int):
+            magic = (magic,)
+        magic = [ (offset, m.encode('latin-1') if isinstance(m, str) else m)
+                  for offset, m in magic ]
+        offset, prefix = magic[0]
+        node = self.tries.setdefault(offset, {})
+        for c in prefix:
+            node = node.setdefault(c, {})
+        # longer headers are more specific and tried first, then
+        # headers are tried in the order they were registered
+        length = sum(len(m) for _, m in magic)
+        node.setdefault(None, []).append((-length, self.count, magic[1:], value))
+        self.count += 1
+
+
+    def match(self, head):
+        """
+        Return the values of all magic headers matching the given bytes,
+        the most specific first.
+        """
+        found = []
+        # parsers may be registered by other threads while matching
+        for offset, node in list(self.tries.items()):
+            pos = offset
+            while node is not None:
+                for entry in node.get(None, ()):
+                    for o, m in entry[2]:
+                        if head[o:o+len(m)] != m:
+                            break
+                    else:
+                        found.append(entry)
+                if pos >= len(head):
+                    break
+                node = node.get(head[pos])
+                pos += 1
+        result = []
+        for entry in sorted(found, key=lambda e: e[:2]):
+            if entry[3] not in result:
+                result.append(entry[3])
+        return result
+
 
 class _Factory:
     """
@@ -107,28 +959,95 @@ class _Factory:
         self.extmap = {}
         self.mimemap = {}
         self.classmap = {}
-        self.magicmap = {}
+        self.magic = MagicIndex()
         self.types = []
+        self._signature = None
+        # lock for registering and importing parsers
+        self._lock = threading.RLock()
         self.device_types = []
         self.directory_types = []
         self.stream_types = []
+        from .parsers import PARSERS
+        for mimetype, extensions, c, magic in PARSERS:
+            self.register(mimetype, extensions, c, magic)
+
+
+    def _setup(self):
+        """
+        Load the plugins. This is called by Singleton when Factory()
+        already returns this object, plugins may register their parsers
+        with kaa.metadata.register when imported.
+        """
+        if PLUGIN_GROUP:
+            self.load_plugins(PLUGIN_GROUP)
+
+
+    def load_plugins(self, group):
+        """
+        Register the parsers of all plugins in the given entry point group.
+        """
+        from importlib.metadata import entry_points
+        try:
+            plugins = entry_points(group=group)
+        except TypeError:
+            # python < 3.10
+            plugins = entry_points().get(group, [])
+        for plugin in plugins:
+            try:
+                plugin.load()(self.register)
+            except Exception:
+                log.exception('Error loading parser plugin %s' % plugin.name)
 
 
     def get_class(self, name):
-        if name not in self.classmap:
+        """
+        Return the parser for the given name. Built-in parsers are named
+        by module relative to kaa.metadata and provide a Parser object,
+        other parsers are named 'module:class'. The module is imported
+        on first use.
+        """
+        cls = self.classmap.get(name)
+        if cls is not None:
+            return cls
+        with self._lock:
+            if name in self.classmap:
+                # imported by another thread meanwhile
+                return self.classmap[name]
             # Import the parser class for the given name.
             try:
-                scope = {}
-                exec('from .%s import Parser' % name, globals(), scope)
-                self.classmap[name] = scope['Parser']
+                if ':' in name:
+                    module, attr = name.split(':', 1)
+                    module = importlib.import_module(module)
+                else:
+                    module, attr = importlib.import_module('.' + name, __package__), 'Parser'
+                self.classmap[name] = getattr(module, attr)
             except BaseException:
                 # Something failed while trying to import this parser.  Rather
                 # than bail altogher, just log the error and use NullParser.
                 log.exception('Error importing parser %s' % name)
                 raise
                 self.classmap[name] = NullParser
+            return self.classmap[name]
+
+
+    def get_module(self, name):
+        """
+        Return the module name of the parser with the given name.
+        """
+        if ':' in name:
+            return name.split(':', 1)[0]
+        return '%s.%s' % (__package__, name)
 
-        return self.classmap[name]
+
+    def signature(self):
+        """
+        Return a string identifying the registered file parsers. It
+        changes when parsers are added or removed.
+        """
+        if self._signature is None:
+            names = ' '.join(sorted(e[R_CLASS] for e in self.types))
+            self._signature = '%08x' % zlib.crc32(names.encode())
+        return self._signature
 
 
     def get_scheme_from_info(self, info):
@@ -138,43 +1057,107 @@ class _Factory:
             return 'file'
 
 
-    def create_from_file(self, file, force=True):
+    def _create(self, name, source, budget):
+        """
+        Create the parser with the given name for source. Parsers
+        getting short reads after the budget ran out often fail with
+        other exceptions than ParseError, these are failures too.
+        """
+        try:
+            return self.get_class(name)(source)
+        except core.ParseError:
+            raise
+        except Exception as e:
+            if budget is None or not budget.truncated:
+                raise
+            log.info('%s failed on truncated data: %s', name, e)
+            raise core.ParseError()
+
+
+    def _try(self, name, source, stats=None):
+        """
+        Create the parser with the given name for source (a file or
+        path). Return the result or None if the parser failed.
+        """
+        budget = None
+        if isinstance(source, ProbeFile):
+            source.seek(0,0)
+            source.skipped = set()
+            budget = source.budget
+            if budget is not None and budget.expired():
+                log.info('time is up, not trying %s', name)
+                return None
+        result = None
+        if stats is None:
+            try:
+                result = self._create(name, source, budget)
+            except core.ParseError:
+                pass
+        else:
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                result = self._create(name, source, budget)
+            except core.ParseError:
+                pass
+            except Exception as e:
+                stats.error(name, e)
+                raise
+            finally:
+                # also record parsers crashing with other exceptions
+                stats.attempt(name, time.perf_counter() - wall, time.process_time() - cpu,
+                              result is not None)
+        if result is not None and budget is not None and budget.truncated:
+            result._set('truncated', True)
+        if result is not None and isinstance(source, ProbeFile) and source.skipped:
+            result._set('skipped', sorted(source.skipped))
+        return result
+
+
+    def create_from_file(self, file, force=True, stats=None, budget=None, fields=None):
         """
         create based on the file stream 'file
         """
+        if not isinstance(file, ProbeFile):
+            # share one read of the file head between all parsers
+            file = ProbeFile(file, stats=stats, budget=budget, fields=fields)
+        elif stats is not None:
+            file.stats = stats
         # Check extension as a hint
         e = os.path.splitext(file.name)[1].lower()
-        parser = None
+        tried = []
         if e and e.startswith('.') and e[1:] in self.extmap:
             log.debug("trying ext %s on file %s", e[1:], file.name)
-            parsers = self.extmap[e[1:]]
+            dispatch, parsers = _dispatch, self.extmap[e[1:]]
+            if dispatch is not None:
+                parsers = dispatch.order(e[1:], parsers)
             for info in parsers:
-                file.seek(0,0)
-                try:
-                    parser = self.get_class(info[R_CLASS])
-                    return parser(file)
-                except core.ParseError:
-                    pass
+                tried.append(info[R_CLASS])
+                if dispatch is not None:
+                    t0 = time.perf_counter()
+                result = self._try(info[R_CLASS], file, stats)
+                if dispatch is not None:
+                    dispatch.add(e[1:], info[R_CLASS], result is not None,
+                                 time.perf_counter() - t0)
+                if result is not None:
+                    return result
 
         # Try to find a parser based on the first bytes of the
         # file (magic header). If a magic header is found but the
         # parser failed, no other parser will be tried to speed
         # up parsing of a bunch of files. So magic information should
         # only be set if the parser is very sure
-        file.seek(0,0)
-        magic = file.read(10)
-        for length, magicmap in list(self.magicmap.items()):
-            if magic[:length] in magicmap:
-                for p in magicmap[magic[:length]]:
-                    log.info('Trying %s by magic header', p[R_CLASS])
-                    file.seek(0,0)
-                    try:
-                        parser = self.get_class(p[R_CLASS])
-                        return parser(file)
-                    except core.ParseError:
-                        pass
-                log.info('Magic header found but parser failed')
-                return None
+        matches = self.magic.match(file.head)
+        if matches:
+            for p in matches:
+                if p[R_CLASS] in tried:
+                    continue
+                log.info('Trying %s by magic header', p[R_CLASS])
+                tried.append(p[R_CLASS])
+                result = self._try(p[R_CLASS], file, stats)
+                if result is not None:
+                    return result
+            log.info('Magic header found but parser failed')
+            return None
 
         if not force:
             log.info('No Type found by Extension (%s). Giving up.' % e)
@@ -182,58 +1165,109 @@ class _Factory:
 
         log.info('No Type found by Extension (%s). Trying all parsers.' % e)
 
-        for e in self.types:
-            if self.get_class(e[R_CLASS]) == parser:
+        # Ask the parsers how sure they are based on the probe buffer.
+        # Parsers ruling the file out are not created at all, the others
+        # are tried with the most confident first.
+        candidates = []
+        for pos, e in enumerate(self.types):
+            if e[R_CLASS] in tried:
                 # We already tried this parser, don't bother again.
                 continue
+            tried.append(e[R_CLASS])
+            sniff = getattr(self.get_class(e[R_CLASS]), 'sniff', None)
+            confidence = sniff(file.head) if sniff else None
+            if confidence is None:
+                candidates.append((1, 0, pos, e))
+            elif confidence > 0:
+                candidates.append((0, -confidence, pos, e))
+        candidates.sort(key=lambda c: c[:3])
+        for _, _, _, e in candidates:
             log.debug('trying %s' % e[R_MIMETYPE])
-            file.seek(0,0)
-            try:
-                return self.get_class(e[R_CLASS])(file)
-            except core.ParseError:
-                pass
+            result = self._try(e[R_CLASS], file, stats)
+            if result is not None:
+                return result
         return None
 
 
-    def create_from_url(self, url, force=True):
+    def create_from_buffer(self, buffer, force=True, stats=None,
+                           fingerprint='opensubtitles', budget=None, fields=None):
         """
-        Create information for urls. This includes file:// and cd://
+        Create information for the BufferFile buffer. The hash is only
+        created if the buffer has the data needed by the method.
         """
+        result = self.create_from_file(buffer, force, stats, budget, fields)
+        if result and fingerprint:
+            from .fingerprint import fingerprint as compute, BLOCK_SIZE
+            size = buffer.size
+            block = min(BLOCK_SIZE, size)
+            if fingerprint == 'full':
+                complete = buffer.available(0, size)
+            else:
+                complete = buffer.available(0, block) and \
+                           buffer.available(size - block, block)
+            if complete:
+                result.hash = compute(buffer, fingerprint, size)
+        return result
+
+
+    def create_from_url(self, url, force=True, stats=None, fingerprint='opensubtitles',
+                        budget=None, fields=None):
+        """
+        Create information for urls. This includes file:// and cd://.
+        http:// and https:// files are read with range requests, see
+        kaa.metadata.remote.
+        """
+        import urllib.parse
         split  = urllib.parse.urlsplit(url)
         scheme = split[0]
 
         if scheme == 'file':
             (scheme, location, path, query, fragment) = split
-            return self.create_from_filename(location+path, force)
+            return self.create_from_filename(location+path, force, stats, fingerprint,
+                                             budget, fields)
 
         elif scheme == 'cdda':
-            r = self.create_from_filename(split[4], force)
+            r = self.create_from_filename(split[4], force, stats, fingerprint, budget,
+                                          fields)
             if r:
                 r._set_url(url)
             return r
 
-        elif scheme == 'http' and False:
-            # This code is deactivated right now. Parsing video data over
-            # http is way to slow right now. We need a better way to handle
-            # this before activating it again.
-            # We will need some more soffisticated and generic construction
-            # method for this. Perhaps move file.open stuff into __init__
-            # instead of doing it here...
-            for e in self.stream_types:
-                log.debug('Trying %s' % e[R_MIMETYPE])
-                try:
-                    return self.get_class(e[R_CLASS])(url)
-                except core.ParseError:
-                    pass
+        elif scheme in ('http', 'https'):
+            from .remote import RemoteFile, RangeError
+            try:
+                file = RemoteFile(url)
+            except RangeError:
+                # No random access, maybe a stream like a web radio. The
+                # stream parsers are not ported yet, give up like before.
+                log.info('%s does not support range requests' % url)
+                return None
+            except IOError as e:
+                log.info('error reading %s: %s' % (url, e))
+                return None
+            try:
+                result = self.create_from_file(file, force, stats, budget, fields)
+                if not result:
+                    return None
+                result._set_url(url)
+                if fingerprint and fingerprint != 'full':
+                    # the full digest would download the whole file
+                    from .fingerprint import fingerprint as compute
+                    result.hash = compute(file, fingerprint, file.size)
+                return result
+            finally:
+                file.close()
 
         elif scheme == 'dvd':
             path = split[2]
             if not path.replace('/', ''):
-                return self.create_from_device('/dev/dvd')
-            return self.create_from_filename(split[2])
+                return self.create_from_device('/dev/dvd', stats)
+            return self.create_from_filename(split[2], stats=stats, fingerprint=fingerprint,
+                                             budget=budget, fields=fields)
 
         else:
             (scheme, location, path, query, fragment) = split
+            import urllib.request
             try:
                 uhandle = urllib.request.urlopen(url)
             except IOError:
@@ -249,89 +1283,102 @@ class _Factory:
             # XXX Todo: Try other types
 
 
-    def create_from_filename(self, filename, force=True):
+    def create_from_filename(self, filename, force=True, stats=None,
+                             fingerprint='opensubtitles', budget=None, fields=None,
+                             st=None):
         """
-        Create information for the given filename
+        Create information for the given filename. The hash of the file
+        is created with the given fingerprint method, None skips it. st
+        is the stat result of the file if already known.
         """
-        if os.path.isdir(filename):
-            return None
-        if os.path.isfile(filename):
+        if st is None:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                return None
+        if stat.S_ISREG(st.st_mode):
             try:
                 f = File(filename,'rb')
             except (IOError, OSError) as e:
                 log.info('error reading %s: %s' % (filename, e))
                 return None
-            result = self.create_from_file(f, force)
-            # create a hash for the file based on hashes from
-            # http://trac.opensubtitles.org/projects/opensubtitles/wiki/HashSourceCodes
-            qwsize = struct.calcsize('q')
-            filehash = filesize = os.path.getsize(filename)
-            for fpos in (0, max(0, filesize - 65536)):
-                f.seek(fpos)
-                # Read up to 64k, but skip the last few bytes if we can't get a
-                # full 64-bit value.
-                buf = f.read(65536)
-                for qw in struct.unpack('%dq' % (len(buf) / qwsize), buf[:len(buf) & ~7]):
-                    filehash = (filehash + qw) & 0xFFFFFFFFFFFFFFFF
-            filehash =  "%016x" % filehash
-            f.close()
-            if result:
+            try:
+                probe = ProbeFile(f, stats=stats, budget=budget, fields=fields)
+                result = self.create_from_file(probe, force, stats)
+                if not result:
+                    return None
                 result._set_url('%s://%s' % (self.get_scheme_from_info(result), os.path.abspath(filename)))
-                result.hash = filehash
+                if fingerprint:
+                    from .fingerprint import fingerprint as compute
+                    result.hash = compute(f, fingerprint, os.fstat(f.fileno()).st_size, probe.head)
                 return result
+            finally:
+                f.close()
         return None
 
 
-    def create_from_device(self,devicename):
+    def create_from_device(self, devicename, stats=None):
         """
         Create information from the device. Currently only rom drives
         are supported.
         """
         for e in self.device_types:
             log.debug('Trying %s' % e[R_MIMETYPE])
-            try:
-                t = self.get_class(e[R_CLASS])(devicename)
+            t = self._try(e[R_CLASS], devicename, stats)
+            if t is not None:
                 t._set_url('%s://%s' % (self.get_scheme_from_info(t), os.path.abspath(devicename)))
                 return t
-            except core.ParseError:
-                pass
         return None
 
 
-    def create_from_directory(self, dirname):
+    def create_from_directory(self, dirname, stats=None):
         """
         Create information from the directory.
         """
         for e in self.directory_types:
             log.debug('Trying %s' % e[R_MIMETYPE])
-            try:
-                return self.get_class(e[R_CLASS])(dirname)
-            except core.ParseError:
-                pass
+            result = self._try(e[R_CLASS], dirname, stats)
+            if result is not None:
+                return result
         return None
 
 
-    def create(self, name, force=True):
+    def create(self, name, force=True, stats=None, fingerprint='opensubtitles',
+               budget=None, fields=None, st=None):
         """
         Global 'create' function. This function calls the different
-        'create_from_'-functions.
+        'create_from_'-functions. The optional ParseStats object stats
+        collects information about the parsing. fingerprint is the
+        method used for the hash of files, see kaa.metadata.fingerprint.
+        The optional Budget limits the reads of the parsers and fields
+        are the keys needed (None for all). st is the stat result of a
+        local name if already known, it is not checked again.
         """
         try:
+            if isinstance(name, BufferFile):
+                return self.create_from_buffer(name, force, stats, fingerprint, budget,
+                                               fields)
             if hasattr(name, 'seek'):
                 # a file-like object
-                return self.create_from_file(name, force)
+                return self.create_from_file(name, force, stats, budget, fields)
             if name.find('://') > 0:
-                return self.create_from_url(name)
-            if not os.path.exists(name):
-                return None
-            if (sys.platform.startswith('freebsd') and \
-                stat.S_ISCHR(os.stat(name)[stat.ST_MODE])) \
-                or stat.S_ISBLK(os.stat(name)[stat.ST_MODE]):
-                return self.create_from_device(name)
-            if os.path.isdir(name):
-                return self.create_from_directory(name)
-            return self.create_from_filename(name, force)
-        except Exception:
+                return self.create_from_url(name, stats=stats, fingerprint=fingerprint,
+                                            budget=budget, fields=fields)
+            if st is None:
+                try:
+                    st = os.stat(name)
+                except OSError:
+                    return None
+            if (sys.platform.startswith('freebsd') and stat.S_ISCHR(st.st_mode)) \
+                   or stat.S_ISBLK(st.st_mode):
+                return self.create_from_device(name, stats)
+            if stat.S_ISDIR(st.st_mode):
+                return self.create_from_directory(name, stats)
+            return self.create_from_filename(name, force, stats, fingerprint, budget,
+                                             fields, st)
+        except Exception as e:
+            if stats is not None and not stats.errors:
+                stats.error(None, e)
             log.exception('kaa.metadata.create error')
             log.warning('Please report this bug to the Freevo mailing list')
             return None
@@ -345,27 +1392,25 @@ class _Factory:
         log.debug('%s registered' % mimetype)
         tuple = (mimetype, extensions, c)
 
-        if extensions == core.EXTENSION_DEVICE:
-            self.device_types.append(tuple)
-        elif extensions == core.EXTENSION_DIRECTORY:
-            self.directory_types.append(tuple)
-        elif extensions == core.EXTENSION_STREAM:
-            self.stream_types.append(tuple)
-        else:
-            self.types.append(tuple)
-            for e in (x.lower() for x in extensions):
-                if e not in self.extmap:
-                    self.extmap[e] = []
-                self.extmap[e].append(tuple)
-            self.mimemap[mimetype] = tuple
-
-        # add to magic header list
-        if magic is not None:
-            if not len(magic) in self.magicmap:
-                self.magicmap[len(magic)] = {}
-            if not magic in self.magicmap[len(magic)]:
-                self.magicmap[len(magic)][magic] = []
-            self.magicmap[len(magic)][magic].append(tuple)
+        # The lists are replaced and not changed, other threads may
+        # iterate over them while parsing.
+        with self._lock:
+            if extensions == core.EXTENSION_DEVICE:
+                self.device_types = self.device_types + [ tuple ]
+            elif extensions == core.EXTENSION_DIRECTORY:
+                self.directory_types = self.directory_types + [ tuple ]
+            elif extensions == core.EXTENSION_STREAM:
+                self.stream_types = self.stream_types + [ tuple ]
+            else:
+                self.types = self.types + [ tuple ]
+                self._signature = None
+                for e in (x.lower() for x in extensions):
+                    self.extmap[e] = self.extmap.get(e, []) + [ tuple ]
+                self.mimemap[mimetype] = tuple
+
+            # add to magic header index
+            if magic is not None:
+                self.magic.add(magic, tuple)
 
 
     def get(self, mimetype, extensions):
@@ -403,10 +1448,21 @@ class Singleton(object):
     def __init__(self, classref):
         self._singleton = None
         self._class = classref
+        # reentrant, the setup of the object may use the singleton
+        self._lock = threading.RLock()
+        self._ready = False
 
     def __call__(self):
-        if self._singleton is None:
-            self._singleton = self._class()
+        if not self._ready:
+            with self._lock:
+                if self._singleton is None:
+                    self._singleton = self._class()
+                    # other threads wait for the setup, this thread
+                    # gets the object while it runs
+                    setup = getattr(self._singleton, '_setup', None)
+                    if setup is not None:
+                        setup()
+                    self._ready = True
         return self._singleton
 
     def __getattr__(self, attr):
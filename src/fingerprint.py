@@ -0,0 +1,131 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# fingerprint.py - content hashes of files
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+
+__all__ = [ 'fingerprint', 'METHODS' ]
+
+# python imports
+import sys
+import array
+import struct
+import hashlib
+
+# size of the blocks at the beginning and end of the file used by the
+# opensubtitles and partial hashes
+BLOCK_SIZE = 65536
+
+# read size of the full file digest
+READ_SIZE = 1048576
+
+
+def _read(file, offset, size, head):
+    """
+    Return a memoryview of size bytes at offset, taken from the already
+    read head of the file if possible.
+    """
+    if offset + size <= len(head):
+        return memoryview(head)[offset:offset+size]
+    file.seek(offset)
+    buf = bytearray(size)
+    return memoryview(buf)[:file.readinto(buf)]
+
+
+def _sum(data):
+    """
+    Sum of the data as little-endian 64 bit integers. A partial integer
+    at the end is ignored.
+    """
+    data = data[:len(data) & ~7]
+    if sys.byteorder == 'little':
+        return sum(data.cast('q'))
+    data = array.array('q', data)
+    data.byteswap()
+    return sum(data)
+
+
+def opensubtitles(file, size, head=b''):
+    """
+    Hash used by opensubtitles.org and most media players: the file size
+    plus the sum of the first and last 64k as 64 bit integers.
+    http://trac.opensubtitles.org/projects/opensubtitles/wiki/HashSourceCodes
+    """
+    filehash = size
+    for offset in (0, max(0, size - BLOCK_SIZE)):
+        filehash += _sum(_read(file, offset, min(BLOCK_SIZE, size - offset), head))
+    return '%016x' % (filehash & 0xFFFFFFFFFFFFFFFF)
+
+
+def partial(file, size, head=b''):
+    """
+    64 bit BLAKE2 digest of the file size and the first and last 64k.
+    """
+    h = hashlib.blake2b(struct.pack('<Q', size), digest_size=8)
+    h.update(_read(file, 0, min(BLOCK_SIZE, size), head))
+    if size > BLOCK_SIZE:
+        offset = max(BLOCK_SIZE, size - BLOCK_SIZE)
+        h.update(_read(file, offset, size - offset, head))
+    return h.hexdigest()
+
+
+def full(file, size, head=b''):
+    """
+    128 bit BLAKE2 digest of the complete file.
+    """
+    h = hashlib.blake2b(head[:size], digest_size=16)
+    file.seek(len(head))
+    buf = bytearray(READ_SIZE)
+    view = memoryview(buf)
+    while True:
+        n = file.readinto(buf)
+        if not n:
+            break
+        h.update(view[:n])
+    return h.hexdigest()
+
+
+METHODS = {
+    'opensubtitles': opensubtitles,
+    'partial': partial,
+    'full': full,
+}
+
+
+def fingerprint(file, method, size, head=b''):
+    """
+    Return the fingerprint of the given seekable binary file with the
+    given size using one of the METHODS. The bytes head from the
+    beginning of the file are used instead of reading them again.
+    """
+    try:
+        func = METHODS[method]
+    except KeyError:
+        raise ValueError('unknown fingerprint method %r' % method)
+    return func(file, size, head)
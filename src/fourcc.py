@@ -1,7 +1,12 @@
 import struct, string, re
+import functools
 
 __all__ = [ 'resolve' ]
 
+# twocc in hex form
+_HEX = re.compile(r'^0x[\da-f]{1,4}$', re.I)
+_PRINTABLE = frozenset(string.printable)
+
 def resolve(code):
     """
     Transform a twocc or fourcc code into a name.  Returns a 2-tuple of (cc,
@@ -12,33 +17,39 @@ def resolve(code):
     the codec.
     """
     if isinstance(code, str):
-        codec = 'Unknown'
-        # Check for twocc
-        if re.match(r'^0x[\da-f]{1,4}$', code, re.I):
-            # Twocc in hex form
-            return code, TWOCC.get(int(code, 16), codec)
-        elif code.isdigit() and 0 <= int(code) <= 0xff:
-            # Twocc in decimal form
-            return hex(int(code)), TWOCC.get(int(code), codec)
-        elif len(code) == 2:
-            code = struct.unpack('H', code)[0]
-            return hex(code), TWOCC.get(code, codec)
-        elif len(code) != 4 and len([ x for x in code if x not in string.printable ]) == 0:
-            # Code is a printable string.
-            codec = str(code)
-
-        if code[:2] == 'MS' and code[2:].upper() in FOURCC:
-            code = code[2:]
-
-        if code.upper() in FOURCC:
-            return code.upper(), str(FOURCC[code.upper()])
-        return None, codec
+        return _resolve(code)
     elif isinstance(code, int):
         return hex(code), TWOCC.get(code, 'Unknown')
 
     return None, 'Unknown'
 
 
+@functools.lru_cache(maxsize=1024)
+def _resolve(code):
+    codec = 'Unknown'
+    # Check for twocc
+    if _HEX.match(code):
+        # Twocc in hex form
+        return code, TWOCC.get(int(code, 16), codec)
+    elif code.isdigit() and 0 <= int(code) <= 0xff:
+        # Twocc in decimal form
+        return hex(int(code)), TWOCC.get(int(code), codec)
+    elif len(code) == 2:
+        code = struct.unpack('H', code)[0]
+        return hex(code), TWOCC.get(code, codec)
+    elif len(code) != 4 and _PRINTABLE.issuperset(code):
+        # Code is a printable string.
+        codec = code
+
+    if code[:2] == 'MS' and code[2:].upper() in FOURCC:
+        code = code[2:]
+
+    upper = code.upper()
+    if upper in FOURCC:
+        return upper, str(FOURCC[upper])
+    return None, codec
+
+
 TWOCC = {
     0x0000: 'Unknown Wave Format',
     0x0001: 'PCM',
@@ -49,6 +49,13 @@ GB_LOGOCODE = '\xCE\xED\x66\x66\xCC\x0D\x00\x0B\x03\x73\x00\x83\x00\x0C\x00\x0D\
 
 class Gameboy(core.Game):
 
+    @classmethod
+    def sniff(cls, head):
+        if head[4:8] == b'\x24\xff\xae\x51' or head[260:264] == b'\xce\xed\x66\x66':
+            return 1.0
+        return 0
+
+
     def __init__(self,file):
         core.Game.__init__(self)
 
@@ -1059,12 +1059,13 @@ class IFD_Tag:
 
 # class that handles an EXIF header
 class EXIF_header:
-    def __init__(self, file, endian, offset, fake_exif, debug=0):
+    def __init__(self, file, endian, offset, fake_exif, debug=0, detailed=True):
         self.file = file
         self.endian = endian
         self.offset = offset
         self.fake_exif = fake_exif
         self.debug = debug
+        self.detailed = detailed
         self.tags = {}
 
     # convert slice to integer, based on sign and endian flags
@@ -1140,7 +1141,7 @@ class EXIF_header:
                 tag_name = 'Tag 0x%04X' % tag
 
             # ignore certain tags for faster processing
-            if not (not detailed and tag in IGNORE_TAGS):
+            if not (not self.detailed and tag in IGNORE_TAGS):
                 field_type = self.s2n(entry + 2, 2)
                 if not 0 < field_type < len(FIELD_TYPES):
                     # unknown field type
@@ -1399,10 +1400,6 @@ class EXIF_header:
 # this is the function that has to deal with all the arbitrary nasty bits
 # of the EXIF standard
 def process_file(f, stop_tag='UNDEF', details=True, debug=False):
-    # yah it's cheesy...
-    global detailed
-    detailed = details
-
     # by default do not fake an EXIF beginning
     fake_exif = 0
 
@@ -1435,7 +1432,7 @@ def process_file(f, stop_tag='UNDEF', details=True, debug=False):
     # deal with the EXIF info we found
     if debug:
         print({b'I': 'Intel', b'M': 'Motorola'}[endian], 'format')
-    hdr = EXIF_header(f, endian, offset, fake_exif, debug)
+    hdr = EXIF_header(f, endian, offset, fake_exif, debug, details)
     ifd_list = hdr.list_IFDs()
     ctr = 0
     for i in ifd_list:
@@ -1486,7 +1483,7 @@ def process_file(f, stop_tag='UNDEF', details=True, debug=False):
     # deal with MakerNote contained in EXIF IFD
     # kaa.metadata addition: also test 'Image Make' in hdr.tags before
     # calling decode_maker_note().
-    if 'EXIF MakerNote' in hdr.tags and 'Image Make' in hdr.tags and detailed:
+    if 'EXIF MakerNote' in hdr.tags and 'Image Make' in hdr.tags and details:
         hdr.decode_maker_note()
 
     # Sometimes in a TIFF file, a JPEG thumbnail is hidden in the MakerNote
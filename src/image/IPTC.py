@@ -125,7 +125,7 @@ c_datasets = {
 
 def flatten(list):
     try:
-        for i, val in list(list.items())[:]:
+        for i, val in tuple(list.items()):
             if len(val) == 0:
                 del list[i]
             elif i == 'keywords':
@@ -139,19 +139,19 @@ def flatten(list):
 
 def parseiptc(app):
     iptc = {}
-    if app[:14] == "Photoshop 3.0\x00":
+    if app[:14] == b"Photoshop 3.0\x00":
         app = app[14:]
 
     # parse the image resource block
     offset = 0
     data = None
-    while app[offset:offset+4] == "8BIM":
+    while app[offset:offset+4] == b"8BIM":
         offset = offset + 4
         # resource code
         code = unpack("<H", app[offset:offset+2])[0]
         offset = offset + 2
         # resource name (usually empty)
-        name_len = ord(app[offset])
+        name_len = app[offset]
         name = app[offset+1:offset+1+name_len]
         offset = 1 + offset + name_len
         if offset & 1:
@@ -173,7 +173,7 @@ def parseiptc(app):
     iptc = {}
     while 1:
         try:
-            intro = ord(data[offset])
+            intro = data[offset]
         except (ValueError, KeyError, IndexError):
             return flatten(iptc)
         if intro != 0x1c:
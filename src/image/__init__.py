@@ -1,5 +0,0 @@
-from . import jpg
-from . import png
-from . import tiff
-from . import bmp
-from . import gif
@@ -46,6 +46,11 @@ log = logging.getLogger('metadata')
 
 class BMP(core.Image):
 
+    @classmethod
+    def sniff(cls, head):
+        return 0.5 if head[:2] == b'BM' else 0
+
+
     def __init__(self,file):
         core.Image.__init__(self)
         self.mime = 'image/bmp'
@@ -59,7 +64,7 @@ class BMP(core.Image):
         # seek to the end to test length
         file.seek(0, 2)
 
-        if bfType != 'BM' or bfSize != file.tell():
+        if bfType != b'BM' or bfSize != file.tell():
             raise core.ParseError()
 
 
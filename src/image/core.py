@@ -36,7 +36,7 @@ import logging
 import xml.sax
 
 # kaa.metadata imports
-from ..core import ParseError, Media, MEDIA_IMAGE
+from ..core import ParseError, Media, MEDIA_IMAGE, wanted
 
 # get logging object
 log = logging.getLogger('metadata')
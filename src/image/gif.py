@@ -46,6 +46,11 @@ log = logging.getLogger('metadata')
 
 class GIF(core.Image):
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:3] == b'GIF' else 0
+
+
     def __init__(self,file):
         core.Image.__init__(self)
         self.mime = 'image/gif'
@@ -78,6 +78,11 @@ class JPG(core.Image):
     """
     table_mapping = { 'EXIF': EXIFMap, 'IPTC': IPTC.mapping }
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:2] == b'\xff\xd8' else 0
+
+
     def __init__(self,file):
         core.Image.__init__(self)
         self.mime = 'image/jpeg'
@@ -110,7 +115,9 @@ class JPG(core.Image):
             elif segtype == 0xe1:
                 data = file.read(seglen-2)
                 type = data[:data.find(b'\0')]
-                if type == b'Exif':
+                if type == b'Exif' and core.wanted(file, 'exif', 'tables', 'thumbnail',
+                                                   'rotation', 'timestamp',
+                                                   *EXIFMap.values()):
                     # create a fake file from the data we have to
                     # pass it to the EXIF parser
                     fakefile = io.BytesIO()
@@ -118,7 +125,9 @@ class JPG(core.Image):
                     fakefile.write(app)
                     fakefile.write(data)
                     fakefile.seek(0)
-                    exif = EXIF.process_file(fakefile)
+                    # maker notes are only needed for the tables
+                    exif = EXIF.process_file(fakefile,
+                                             details=core.wanted(file, 'makernote', 'tables'))
                     fakefile.close()
                     if exif:
                         self.thumbnail = exif.get('JPEGThumbnail', None)
@@ -153,6 +162,10 @@ class JPG(core.Image):
                 else:
                     pass
 
+            elif segtype == 0xed and \
+                     not core.wanted(file, 'iptc', 'tables', *IPTC.mapping.values()):
+                file.seek(seglen-2,1)
+
             elif segtype == 0xed:
                 iptc = IPTC.parseiptc(file.read(seglen-2))
                 if iptc:
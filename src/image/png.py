@@ -52,6 +52,11 @@ PNGSIGNATURE = "\211PNG\r\n\032\n"
 
 class PNG(core.Image):
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:8] == b'\x89PNG\r\n\x1a\n' else 0
+
+
     def __init__(self,file):
         core.Image.__init__(self)
         self.mime = 'image/png'
@@ -52,6 +52,11 @@ class TIFF(core.Image):
 
     table_mapping = { 'IPTC': IPTC.mapping }
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:4] in (b'II*\x00', b'MM\x00*') else 0
+
+
     def __init__(self,file):
         core.Image.__init__(self)
         self.iptc = None
@@ -1,7 +1,11 @@
 import re
+import functools
 
 __all__ = [ 'resolve' ]
 
+# characters ending the language part of a code like 'en_US'
+_SPLIT = re.compile(r'[^a-z]')
+
 def resolve(code):
     """
     Transform the given (2- or 3-letter) language code to a human readable
@@ -13,15 +17,14 @@ def resolve(code):
         return None, None
     if not isinstance(code, str):
         raise ValueError('Invalid language code specified by parser')
+    return _resolve(code)
 
-    # Take up to 3 letters from the code.
-    code = re.split(r'[^a-z]', code.lower())[0][:3]
-
-    for spec in codes:
-        if code in spec[:-1]:
-            return code, spec[-1]
 
-    return code, 'Unknown (%s)' % code
+@functools.lru_cache(maxsize=1024)
+def _resolve(code):
+    # Take up to 3 letters from the code.
+    code = _SPLIT.split(code.lower(), 1)[0][:3]
+    return code, _names.get(code, 'Unknown (%s)' % code)
 
 
 # Parsed from http://www.loc.gov/standards/iso639-2/ISO-639-2_utf-8.txt
@@ -513,3 +516,10 @@ codes = (
    ('zxx', 'No linguistic content'),
    ('zza', 'Zaza'),
 )
+
+# code -> name, the first entry of a code wins
+_names = {}
+for spec in codes:
+    for code in spec[:-1]:
+        _names.setdefault(code, spec[-1])
+del spec, code
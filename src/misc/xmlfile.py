@@ -53,6 +53,12 @@ class Identified:
 
 class XML(core.Media):
 
+    @classmethod
+    def sniff(cls, head):
+        # only files with a xml or html extension are detected
+        return 0
+
+
     def __init__(self,file):
         ext = os.path.splitext(file.name)[1].lower()
         if not ext in ('.xml', '.fxd', '.html', '.htm'):
@@ -0,0 +1,104 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# parsers.py - table of the built-in parsers
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+
+__all__ = [ 'PARSERS' ]
+
+# kaa.metadata imports
+from .core import EXTENSION_STREAM, EXTENSION_DEVICE, EXTENSION_DIRECTORY
+
+# The built-in parsers as (mimetype, extensions, module, magic) tuples.
+# The factory registers them in this order on first use, the parser
+# modules are only imported when a parser is needed.
+#
+# The magic headers are used to detect files without a known
+# extension. They should only be set if the parser is very sure, files
+# matching a magic header are not given to the other parsers. Short
+# prefixes like ID3 or BM or the ISO 9660 header of any disc image are
+# no proof of the format, those parsers rate the header with sniff()
+# instead.
+PARSERS = [
+    # Audio parsers
+    ('audio/mpeg', ('mp3',), 'audio.mp3', None),
+    ('audio/ac3', ('ac3',), 'audio.ac3', None),
+    ('application/adts', ('aac',), 'audio.adts', None),
+    ('audio/m4a', ('m4a',), 'audio.m4a', ((4, b'ftyp'), (8, b'M4A '))),
+    ('application/ogg', ('ogg',), 'audio.ogg', b'OggS\x00'),
+    ('application/pcm', ('aif','voc','au'), 'audio.pcm',
+     [((0, b'FORM'), (8, b'AIFF')), ((0, b'FORM'), (8, b'AIFC')),
+      b'.snd', b'Creative Voice File']),
+
+    # Video parsers
+    ('video/asf', ('asf','wmv','wma'), 'video.asf',
+     b'\x30\x26\xb2\x75\x8e\x66\xcf\x11\xa6\xd9\x00\xaa\x00\x62\xce\x6c'),
+    ('video/flv', ('flv',), 'video.flv', b'FLV\x01'),
+    ('application/mkv', ('mkv', 'mka', 'webm'), 'video.mkv', b'\x1a\x45\xdf\xa3'),
+    ('video/quicktime', ('mov', 'qt', 'mp4', 'mp4a', '3gp', '3gp2', 'mk2'), 'video.mp4',
+     [(4, b'ftyp'), (4, b'moov'), (4, b'mdat'), (4, b'wide'), (4, b'free')]),
+    ('video/mpeg', ('mpeg','mpg','mp4', 'ts'), 'video.mpeg',
+     [b'\x00\x00\x01\xba', b'\x00\x00\x01\xb3',
+      ((0, b'\x47'), (188, b'\x47'), (376, b'\x47'))]),
+    ('application/ogg', ('ogm', 'ogg'), 'video.ogm', b'OggS\x00'),
+    ('video/real', ('rm', 'ra', 'ram'), 'video.real', b'.RMF'),
+    ('video/avi', ('wav','avi'), 'video.riff',
+     [((0, b'RIFF'), (8, b'AVI ')), ((0, b'RIFF'), (8, b'WAVE'))]),
+    ('video/vcd', ('cue',), 'video.vcd', None),
+
+    # Disc parsers
+    ('audio/cd', EXTENSION_DEVICE, 'disc.audio', None),
+    ('video/dvd', EXTENSION_DEVICE, 'disc.dvd', None),
+    ('video/dvd', EXTENSION_DIRECTORY, 'disc.dvd', None),
+    ('video/dvd', ('iso',), 'disc.dvd', None),
+    ('video/vcd', EXTENSION_DEVICE, 'disc.vcd', None),
+    ('cd/unknown', EXTENSION_DEVICE, 'disc.data', None),
+
+    # Image parsers. The exiv2 based image.generic parser is
+    # experimental and not registered.
+    ('image/bmp', ('bmp', ), 'image.bmp', None),
+    ('image/gif', ('gif', ), 'image.gif', [b'GIF87a', b'GIF89a']),
+    ('image/jpeg', ('jpg','jpeg'), 'image.jpg', b'\xff\xd8\xff'),
+    ('image/png', ('png',), 'image.png', b'\x89PNG\r\n\x1a\n'),
+    ('image/tiff', ('tif','tiff'), 'image.tiff', [b'II*\x00', b'MM\x00*']),
+
+    # Games parsers
+    ('games/gameboy', ('gba', 'gb', 'gbc'), 'games.gameboy',
+     [(4, b'\x24\xff\xae\x51\x69\x9a\xa2\x21'), (260, b'\xce\xed\x66\x66\xcc\x0d\x00\x0b')]),
+    ('games/snes', ('smc', 'sfc', 'fig'), 'games.snes', None),
+
+    # Misc parsers
+    ('directory', EXTENSION_DIRECTORY, 'misc.directory', None),
+    ('text/xml', ('xml', 'fxd', 'html', 'htm'), 'misc.xmlfile', None),
+
+    # These parsers are prone to producing false positives, so we use them
+    # last.  They should be fixed.
+    ('text/plain', EXTENSION_STREAM, 'audio.webradio', None),
+    ('application/flac', ('flac',), 'audio.flac', b'fLaC'),
+]
@@ -0,0 +1,245 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# remote.py - seekable file on http urls using range requests
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+
+__all__ = [ 'RemoteFile', 'RangeError' ]
+
+# python imports
+import re
+import logging
+import collections
+import urllib.parse
+import urllib.request
+import urllib.error
+
+# get logging object
+log = logging.getLogger('metadata')
+
+# size of the blocks fetched from the server and cached
+BLOCK_SIZE = 65536
+
+# number of blocks kept in the cache (16 MB)
+CACHE_BLOCKS = 256
+
+# blocks fetched in addition to the requested ones when a parser reads
+# the file sequentially
+READ_AHEAD = 3
+
+# timeout for one request in seconds
+TIMEOUT = 30
+
+CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class RangeError(IOError):
+    """
+    The server does not support range requests for the url.
+    """
+    pass
+
+
+class RemoteFile(object):
+    """
+    Read only seekable file on a http or https url. Only the blocks a
+    parser reads are fetched with range requests and kept in a LRU
+    cache. Missing neighbouring blocks are fetched in one request and
+    sequential reads also fetch the next READ_AHEAD blocks.
+    """
+    def __init__(self, url, block_size=None, cache_blocks=None, read_ahead=None,
+                 timeout=None):
+        self.url = url
+        # the path is used to guess the type by the extension
+        self.name = urllib.parse.unquote(urllib.parse.urlsplit(url)[2])
+        self.block_size = block_size or BLOCK_SIZE
+        self.cache_blocks = cache_blocks or CACHE_BLOCKS
+        self.read_ahead = READ_AHEAD if read_ahead is None else read_ahead
+        self.timeout = timeout or TIMEOUT
+        self.closed = False
+        # number of requests and bytes fetched from the server
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._blocks = collections.OrderedDict()
+        self._pos = 0
+        # block after the last read, used to detect sequential reads
+        self._next = 0
+        self.size = None
+        self._fetch(0, 0)
+
+
+    def _fetch(self, first, last):
+        """
+        Fetch the blocks first to last in one request, store them in the
+        cache and return them.
+        """
+        start = first * self.block_size
+        end = (last + 1) * self.block_size - 1
+        if self.size is not None:
+            end = min(end, self.size - 1)
+        request = urllib.request.Request(self.url, headers={'Range': 'bytes=%d-%d' % (start, end)})
+        self.requests += 1
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and self.size is None:
+                # range not satisfiable, the file is empty
+                match = re.search(r'/(\d+)', e.headers.get('Content-Range', ''))
+                if match and int(match.group(1)) == 0:
+                    self.size = 0
+                    return []
+            raise
+        with response:
+            if response.status == 206:
+                match = CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                if not match or int(match.group(1)) != start:
+                    raise IOError('bad Content-Range from %s' % self.url)
+                if self.size is None:
+                    if match.group(3) == '*':
+                        raise RangeError('unknown size of %s' % self.url)
+                    self.size = int(match.group(3))
+                data = response.read(int(match.group(2)) - start + 1)
+            elif start == 0 and self.size is None:
+                # the server ignores the range, accept the complete body
+                # if it fits into the block
+                data = response.read(self.block_size + 1)
+                if len(data) > self.block_size:
+                    raise RangeError('%s does not support range requests' % self.url)
+                self.size = len(data)
+            else:
+                raise IOError('range request to %s failed: %s' % (self.url, response.status))
+        self.bytes_fetched += len(data)
+        blocks = [ data[pos:pos+self.block_size] for pos in range(0, len(data), self.block_size) ]
+        for block in blocks:
+            self._store(first, block)
+            first += 1
+        return blocks
+
+
+    def _store(self, block, data):
+        """
+        Add a block to the cache and remove the least recently used ones.
+        """
+        self._blocks[block] = data
+        self._blocks.move_to_end(block)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+
+    def _load(self, first, last):
+        """
+        Return the blocks first to last, fetching the missing ones.
+        """
+        blocks = self._blocks
+        fetch = last
+        if first in (self._next, self._next - 1):
+            # sequential read, fetch the following blocks with this request
+            fetch = min(last + self.read_ahead, (self.size - 1) // self.block_size)
+        result = []
+        block = first
+        while block <= last:
+            if block in blocks:
+                blocks.move_to_end(block)
+                result.append(blocks[block])
+                block += 1
+                continue
+            # coalesce all missing blocks into one request
+            end = block
+            while end < fetch and end + 1 not in blocks:
+                end += 1
+            data = self._fetch(block, end)[:min(end, last) - block + 1]
+            if len(data) < min(end, last) - block + 1:
+                raise IOError('short read from %s' % self.url)
+            result.extend(data)
+            block = end + 1
+        self._next = last + 1
+        return result
+
+
+    def read(self, size=-1):
+        """
+        Read up to size bytes.
+        """
+        pos = self._pos
+        end = self.size if size is None or size < 0 else min(pos + size, self.size)
+        if pos >= end:
+            return b''
+        first = pos // self.block_size
+        blocks = self._load(first, (end - 1) // self.block_size)
+        offset = pos - first * self.block_size
+        if len(blocks) == 1:
+            data = blocks[0][offset:offset + end - pos]
+        else:
+            data = b''.join(blocks)[offset:offset + end - pos]
+        self._pos = end
+        return data
+
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+    def readline(self, size=-1):
+        """
+        Read one line, block by block.
+        """
+        line = b''
+        while size is None or size < 0 or len(line) < size:
+            block = self.read(self.block_size if size is None or size < 0 else
+                              min(self.block_size, size - len(line)))
+            if not block:
+                break
+            end = block.find(b'\n') + 1
+            if end:
+                self._pos -= len(block) - end
+                return line + block[:end]
+            line += block
+        return line
+
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self.size
+        if offset < 0:
+            raise IOError('invalid seek position %s' % offset)
+        self._pos = offset
+        return offset
+
+
+    def tell(self):
+        return self._pos
+
+
+    def close(self):
+        self._blocks.clear()
+        self.closed = True
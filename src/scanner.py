@@ -0,0 +1,197 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# scanner.py - incremental scan of directory trees
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+__all__ = [ 'scan', 'Manifest' ]
+
+# python imports
+import os
+import logging
+
+# kaa.metadata imports
+from . import core
+from . import utils
+from . import factory
+
+# get logging object
+log = logging.getLogger('metadata')
+
+# commit the manifest after this many changed files
+COMMIT_INTERVAL = 1000
+
+class Manifest(object):
+    """
+    Inode, size and mtime of the files seen by the last scan, stored in
+    a sqlite database keyed on the absolute path.
+    """
+    def __init__(self, path=None):
+        import sqlite3
+        if path is None:
+            path = os.path.join(utils.get_temp_path('kaa-metadata'), 'manifest.db')
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60)
+        self._db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, '
+                         'ino INTEGER, size INTEGER, mtime INTEGER)')
+        self._db.commit()
+
+
+    def entries(self, root):
+        """
+        Return a dict path -> (ino, size, mtime) of the files below root.
+        """
+        # all paths starting with root/, the next character after the
+        # separator ends the range
+        prefix = os.path.join(root, '')
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        cursor = self._db.execute('SELECT path, ino, size, mtime FROM files WHERE '
+                                  'path >= ? AND path < ?', (prefix, end))
+        return dict((row[0], row[1:]) for row in cursor)
+
+
+    def set(self, path, key):
+        """
+        Store the (ino, size, mtime) key of the file.
+        """
+        self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)', (path,) + key)
+
+
+    def remove(self, path):
+        """
+        Remove the file from the manifest.
+        """
+        self._db.execute('DELETE FROM files WHERE path=?', (path,))
+
+
+    def commit(self):
+        self._db.commit()
+
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+
+def _walk(root, failed):
+    """
+    Yield (path, stat result) of the regular files below root. The stat
+    result of the directory entry is used, there is no extra stat call
+    on systems returning it with the entry. Symbolic links to
+    directories are not followed. Directories that could not be read
+    are added to failed.
+    """
+    dirs = [ root ]
+    while dirs:
+        path = dirs.pop()
+        try:
+            entries = os.scandir(path)
+        except OSError as e:
+            if path == root:
+                raise
+            log.warning('cannot scan %s: %s', path, e)
+            failed.append(path)
+            continue
+        with entries:
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.path, entry.stat()
+                except OSError as e:
+                    # removed while scanning or dangling link
+                    log.debug('cannot stat %s: %s', entry.path, e)
+        # scan in name order
+        dirs.extend(sorted(subdirs, reverse=True))
+
+
+def scan(root, manifest=None, workers=None, force=True, fingerprint='opensubtitles'):
+    """
+    Scan the directory tree root and yield (event, path, info) for the
+    files added, changed or removed since the last scan. event is
+    'added', 'changed' or 'removed', info the Media object of the file
+    or None for removed files and files no parser accepted.
+
+    A file is changed if its inode, size or mtime differ from the
+    manifest (a path or Manifest object, default: in the kaa-metadata
+    temp directory). Unchanged files are not opened. The changed files
+    are parsed in this process or, if workers is given, in a pool of
+    that many processes (see parse_many). Files of a crashed or hanging
+    worker are reported without info and not stored in the manifest, the
+    next scan tries them again. Removed files are reported once the
+    complete tree is scanned.
+    """
+    root = os.path.abspath(root)
+    own = not isinstance(manifest, Manifest)
+    if own:
+        manifest = Manifest(manifest)
+    known = manifest.entries(root)
+    # (event, key) of the files handed to the parser
+    pending = {}
+    failed = []
+
+    def changed():
+        for path, st in _walk(root, failed):
+            key = st.st_ino, st.st_size, st.st_mtime_ns
+            old = known.pop(path, None)
+            if old is None or old != key:
+                pending[path] = 'added' if old is None else 'changed', key
+                yield path, st
+
+    if workers:
+        # without stats the file of a hanging worker was not parsed
+        results = ((path, core.Media(info) if info else None, stats is not None)
+                   for path, info, stats in
+                   factory.parse_many((path for path, st in changed()), workers,
+                                      force=force, fingerprint=fingerprint, stats=True))
+    else:
+        results = ((path, factory.parse(path, force, fingerprint=fingerprint), True)
+                   for path, st in changed())
+    try:
+        for n, (path, info, done) in enumerate(results):
+            event, key = pending.pop(path)
+            if done:
+                manifest.set(path, key)
+            if n % COMMIT_INTERVAL == COMMIT_INTERVAL - 1:
+                manifest.commit()
+            yield event, path, info
+        # files below directories that could not be read are kept
+        prefixes = tuple(os.path.join(path, '') for path in failed)
+        for path in sorted(known):
+            if prefixes and path.startswith(prefixes):
+                continue
+            manifest.remove(path)
+            yield 'removed', path, None
+    finally:
+        results.close()
+        if own:
+            manifest.close()
+        else:
+            manifest.commit()
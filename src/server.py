@@ -0,0 +1,496 @@
+# -*- coding: iso-8859-1 -*-
+# -----------------------------------------------------------------------------
+# server.py - metadata daemon on a unix socket and its client
+# -----------------------------------------------------------------------------
+# $Id$
+#
+# -----------------------------------------------------------------------------
+# kaa-Metadata - Media Metadata for Python
+# Copyright (C) 2003-2006 Thomas Schueppel, Dirk Meyer
+#
+# First Edition: Thomas Schueppel <stain@acm.org>
+# Maintainer:    Dirk Meyer <https://github.com/Dischi>
+#
+# Please see the file AUTHORS for a complete list of authors.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MER-
+# CHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+#
+# -----------------------------------------------------------------------------
+
+__all__ = [ 'Server', 'Client', 'ServerError' ]
+
+# python imports
+import os
+import time
+import struct
+import logging
+import threading
+# needed for the base classes, kaa.metadata imports this module only
+# when Server or Client are used
+import socketserver
+
+# kaa.metadata imports
+from . import core
+from . import utils
+from . import factory
+
+# get logging object
+log = logging.getLogger('metadata')
+
+# requests and responses larger than this are refused
+MAX_MESSAGE = 64 * 1024 * 1024
+
+# seconds a worker may parse one file before the pool is restarted
+TIMEOUT = 60
+
+# times a request is resubmitted after the pool was restarted for
+# another request
+RETRIES = 3
+
+# keyword arguments of parse a request may set
+OPTIONS = ('force', 'fingerprint', 'max_bytes', 'max_seconds', 'fields')
+
+def default_path():
+    """
+    Return the socket path used if none is given.
+    """
+    return os.path.join(utils.get_temp_path('kaa-metadata'), 'server.sock')
+
+
+def send(wfile, message):
+    """
+    Write a message as length-prefixed JSON to the file object.
+    """
+    import json
+    data = json.dumps(message).encode('utf-8')
+    wfile.write(struct.pack('>I', len(data)) + data)
+    wfile.flush()
+
+
+def receive(rfile):
+    """
+    Read a length-prefixed JSON message from the file object. Returns
+    None at the end of the stream.
+    """
+    head = rfile.read(4)
+    if len(head) < 4:
+        return None
+    size = struct.unpack('>I', head)[0]
+    if size > MAX_MESSAGE:
+        raise ValueError('message too large: %d bytes' % size)
+    data = rfile.read(size)
+    if len(data) < size:
+        return None
+    import json
+    return json.loads(data.decode('utf-8'))
+
+
+def _parse(filename, options):
+    """
+    Parse the file and return the result as JSON types or None. This is
+    run in the worker processes of the server and by clients without a
+    server.
+    """
+    info = factory.parse(filename, **options)
+    return core.jsonable(info.convert()) if info else None
+
+
+def _select(info, fields):
+    """
+    Return only the keys of the result needed for the fields.
+    """
+    if info is None:
+        return None
+    keys = set(f.split('.')[0] for f in fields)
+    return dict((k, v) for k, v in info.items() if k in keys)
+
+
+def _init_worker(cache):
+    """
+    Initialize a worker process of the server: import all parsers and
+    use the result cache of the server process.
+    """
+    f = factory.Factory()
+    for t in f.types:
+        f.get_class(t[factory.R_CLASS])
+    if cache is not None:
+        factory.enable_cache(*cache)
+
+
+def _options(request):
+    """
+    Return the parse options of the request.
+    """
+    options = dict((k, v) for k, v in request.items() if k in OPTIONS)
+    if options.get('fields') is not None:
+        options['fields'] = frozenset(options['fields'])
+    return options
+
+
+class ServerError(Exception):
+    """
+    The server could not handle a request.
+    """
+    pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Handler for one client connection. A client can send any number of
+    requests, each gets one response.
+    """
+    def handle(self):
+        while True:
+            try:
+                request = receive(self.rfile)
+            except (ValueError, OSError) as e:
+                log.warning('bad request: %s', e)
+                return
+            if request is None:
+                return
+            try:
+                response = { 'result': self.server.handle_request_message(request) }
+            except (ServerError, KeyError, TypeError, AttributeError) as e:
+                # bad request or crashed worker
+                log.warning('request %s failed: %s', request.get('method'), e)
+                response = { 'error': '%s: %s' % (e.__class__.__name__, e) }
+            except Exception as e:
+                log.exception('request %s failed', request.get('method'))
+                response = { 'error': '%s: %s' % (e.__class__.__name__, e) }
+            if 'error' in response:
+                self.server.count('errors')
+            try:
+                send(self.wfile, response)
+            except OSError:
+                return
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Daemon answering parse requests on a unix socket. The parser
+    modules stay imported in a pool of worker processes and the result
+    cache (if enabled in the server process) is shared by all clients.
+
+    Requests and responses are JSON objects prefixed with their length
+    as 4 byte big-endian integer. A request has a method and its
+    arguments, the response has the result or an error::
+
+        { "method": "parse", "filename": "foo.mkv", "fields": ["length"] }
+        { "result": { "length": 5.0, ... } }
+
+    The methods are parse (filename and the options of kaa.metadata.parse),
+    parse_many (filenames and options, the results in the same order),
+    fields (filename and fields, only these keys of the result) and
+    stats (counters of the server).
+
+    A file not parsed after timeout seconds in a worker fails the
+    request, the pool is restarted to get rid of the hanging worker.
+    The other requests in the pool are submitted again. The workers are
+    started by a fork server, they do not inherit the threads, locks or
+    client connections of the server process.
+    """
+    daemon_threads = True
+
+    def __init__(self, path=None, workers=None, timeout=TIMEOUT):
+        import weakref
+        import multiprocessing
+        import concurrent.futures
+        self.path = path or default_path()
+        if os.path.exists(self.path):
+            client = Client(self.path, fallback=False)
+            running = client.alive()
+            client.close()
+            if running:
+                raise ServerError('server already running on %s' % self.path)
+            # stale socket of a server that did not shut down
+            os.unlink(self.path)
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        cache = factory._cache
+        if cache is not None:
+            cache = cache.path, cache.max_entries, cache.max_size, cache.negative_ttl
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = dict(requests=0, files=0, failed=0, errors=0)
+        # pools killed because of a timeout, see submit
+        self._killed = weakref.WeakSet()
+        context = multiprocessing.get_context('forkserver')
+        self._executor = lambda: concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=_init_worker, initargs=(cache,))
+        # start the fork server and import the parsers in a worker
+        # before the first request
+        self._pool = self._executor()
+        self._pool.submit(os.getpid).result()
+        socketserver.UnixStreamServer.__init__(self, self.path, _Handler)
+
+
+    def submit(self, filenames, options):
+        """
+        Parse the files in the worker pool and return the results in
+        the order of the files. Files lost because the pool was killed
+        for another request are submitted to the new pool.
+        """
+        from concurrent.futures import CancelledError
+        from concurrent.futures.process import BrokenProcessPool
+        results = [ None ] * len(filenames)
+        todo = list(range(len(filenames)))
+        for retry in range(RETRIES + 1):
+            try:
+                # the pool is shut down only after it was replaced
+                with self._lock:
+                    pool = self._pool
+                    futures = [ (pos, pool.submit(_parse, filenames[pos], options))
+                                for pos in todo ]
+                for pos, future in futures:
+                    results[pos] = self._wait(future)
+                    todo.remove(pos)
+                break
+            except (BrokenProcessPool, CancelledError):
+                if pool in self._killed:
+                    # another request timed out, try again
+                    continue
+                # A worker crashed, start a new pool for the next requests
+                self._restart(pool)
+                raise ServerError('worker process died')
+            except TimeoutError:
+                log.warning('parsing %s timed out, restarting workers', filenames)
+                self._restart(pool, kill=True)
+                raise ServerError('timeout after %s seconds' % self.timeout)
+        else:
+            raise ServerError('workers restarted %d times' % (RETRIES + 1))
+        self.count('files', len(results))
+        self.count('failed', results.count(None))
+        return results
+
+
+    def _wait(self, future):
+        """
+        Return the result of the future. Raises TimeoutError if it is
+        running for more than timeout seconds, the time waiting in the
+        queue of the pool does not count.
+        """
+        import concurrent.futures
+        started = None
+        while True:
+            if started is None:
+                wait = min(1, self.timeout)
+            else:
+                wait = max(0, started + self.timeout - time.monotonic())
+            try:
+                return future.result(wait)
+            except concurrent.futures.TimeoutError:
+                if started is not None:
+                    raise TimeoutError()
+                if future.running():
+                    started = time.monotonic() - wait
+
+
+    def _restart(self, pool, kill=False):
+        """
+        Replace the pool with a new one. If kill is True, the workers of
+        the old pool are terminated, one of them may hang.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                # already done by another request
+                return
+            self._pool = self._executor()
+            if kill:
+                self._killed.add(pool)
+        if kill:
+            for process in list(pool._processes.values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+    def count(self, counter, n=1):
+        """
+        Increase a counter for the stats method.
+        """
+        with self._lock:
+            self.counters[counter] += n
+
+
+    def handle_request_message(self, request):
+        """
+        Handle a request and return the result.
+        """
+        self.count('requests')
+        method = request.get('method')
+        if method == 'parse':
+            return self.submit([ request['filename'] ], _options(request))[0]
+        if method == 'parse_many':
+            return self.submit(request['filenames'], _options(request))
+        if method == 'fields':
+            info = self.submit([ request['filename'] ], _options(request))[0]
+            return _select(info, request['fields'])
+        if method == 'stats':
+            with self._lock:
+                stats = dict(self.counters)
+            stats.update(uptime=time.time() - self.started, workers=self.workers,
+                         pid=os.getpid(), cache=factory._cache and factory._cache.path)
+            return stats
+        raise ServerError('unknown method %r' % method)
+
+
+    def handle_error(self, request, client_address):
+        log.exception('error in connection')
+
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class Client(object):
+    """
+    Client for the metadata server. The results are the JSON form of
+    Media.convert(): binary data is replaced by its size and tags are
+    plain values. If no server is running on path and fallback is True,
+    the files are parsed in this process and the same results are
+    returned, otherwise the OSError is raised. Errors of the server
+    raise ServerError. A client can be used from several threads.
+    """
+    def __init__(self, path=None, timeout=None, fallback=True):
+        self.path = path or default_path()
+        self.timeout = timeout
+        self.fallback = fallback
+        self._lock = threading.Lock()
+        self._sock = self._file = None
+
+
+    def _call(self, method, **args):
+        """
+        Send a request to the server and return the result. Raises
+        OSError if the server is not reachable.
+        """
+        with self._lock:
+            for retry in (True, False):
+                if self._sock is None:
+                    import socket
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.settimeout(self.timeout)
+                    try:
+                        sock.connect(self.path)
+                    except OSError:
+                        sock.close()
+                        raise
+                    self._sock, self._file = sock, sock.makefile('rwb')
+                try:
+                    args['method'] = method
+                    send(self._file, args)
+                    response = receive(self._file)
+                except OSError:
+                    response = None
+                if response is not None:
+                    break
+                # The server closed the connection, e.g. it was restarted.
+                # Reconnect once, requests are safe to repeat.
+                self.close()
+                if not retry:
+                    raise ConnectionError('no response from %s' % self.path)
+        if 'error' in response:
+            raise ServerError(response['error'])
+        return response['result']
+
+
+    def _request(self, method, fallback, **args):
+        if self.fallback:
+            try:
+                return self._call(method, **args)
+            except (FileNotFoundError, ConnectionRefusedError):
+                return fallback()
+        return self._call(method, **args)
+
+
+    def alive(self):
+        """
+        Return True if the server is running.
+        """
+        try:
+            self._call('stats')
+            return True
+        except (OSError, ServerError):
+            return False
+
+
+    def parse(self, filename, **options):
+        """
+        Parse the file, options are the keyword arguments of
+        kaa.metadata.parse except stats. Returns a dict or None.
+        """
+        filename = os.path.abspath(filename)
+        return self._request('parse', lambda: _parse(filename, _options(options)),
+                             filename=filename, **self._encode(options))
+
+
+    def parse_many(self, filenames, **options):
+        """
+        Parse the files and return a list of the results in the same
+        order.
+        """
+        filenames = [ os.path.abspath(f) for f in filenames ]
+        return self._request('parse_many',
+                             lambda: [ _parse(f, _options(options)) for f in filenames ],
+                             filenames=filenames, **self._encode(options))
+
+
+    def fields(self, filename, fields, **options):
+        """
+        Parse the file for the given fields and return a dict with only
+        these keys or None.
+        """
+        filename, fields = os.path.abspath(filename), list(fields)
+        fallback = lambda: _select(_parse(filename, _options(dict(options, fields=fields))),
+                                   fields)
+        return self._request('fields', fallback, filename=filename, fields=fields,
+                             **self._encode(options))
+
+
+    def stats(self):
+        """
+        Return the counters of the server or None if it is not running.
+        """
+        return self._request('stats', lambda: None)
+
+
+    def _encode(self, options):
+        """
+        Check the options and make them JSON serializable.
+        """
+        for key in options:
+            if key not in OPTIONS:
+                raise TypeError('unknown option %r' % key)
+        if options.get('fields') is not None:
+            options = dict(options, fields=list(options['fields']))
+        return options
+
+
+    def close(self):
+        """
+        Close the connection to the server.
+        """
+        if self._sock is not None:
+            try:
+                self._file.close()
+            except OSError:
+                # unsent data of a broken connection
+                pass
+            self._sock.close()
+        self._sock = self._file = None
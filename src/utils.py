@@ -22,9 +22,7 @@
 import sys
 import locale
 import os
-import getpass
 import stat
-from tempfile import mktemp, gettempdir
 
 def _detect_encoding():
     """
@@ -152,6 +150,9 @@ def tostr(value, encoding=None, desperate=True, coerce=False, fs=False):
         errors = 'surrogateescape'
 
     # We now have a bytes object to decode.
+    if not encoding and value.isascii():
+        # valid in all encodings that could be the locale encoding
+        return value.decode('ascii')
     for c in (encoding or ENCODING, 'utf-8', 'latin-1'):
         try:
             return value.decode(c, errors)
@@ -192,6 +193,8 @@ def get_temp_path(appname):
         return get_temp_path.paths[appname]
     except KeyError:
         # create tmp directory for the user
+        from tempfile import gettempdir
+        import getpass
         base = gettempdir()
         path = os.path.join(base, '{}-{}'.format(appname, getpass.getuser()))
         if not os.path.isdir(path):
@@ -230,6 +233,7 @@ def tempfile(appname, name='', suffix='', unique=True):
         os.mkdir(os.path.dirname(name))
     if not unique:
         return name
+    from tempfile import mktemp
     return mktemp(suffix=suffix, prefix=os.path.basename(name), dir=os.path.dirname(name))
 
 
@@ -105,12 +105,20 @@ GUIDS = {
     'ASF_Audio_Spread' : _guid('BFC3CD50-618F-11CF-8BB2-00AA00B4E220'),
     }
 
+# first bytes of an asf file, the header object guid
+ASF_HEADER = uuid.UUID('75B22630-668E-11CF-A6D9-00AA0062CE6C').bytes_le
+
 
 class Asf(core.AVContainer):
     """
     ASF video parser. The ASF format is also used for Microsft Windows
     Media files like wmv.
     """
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:16] == ASF_HEADER else 0
+
+
     def __init__(self, file):
         core.AVContainer.__init__(self)
         self.mime = 'video/x-ms-asf'
@@ -393,8 +401,10 @@ def Parser(file):
         return asf
     # No video but audio streams. Handle has audio core
     audio = AsfAudio()
-    for key in audio._keys:
-        if key in asf._keys:
+    for key in audio._keyset:
+        if key in asf._keyset:
             if not getattr(audio, key, None):
                 setattr(audio, key, getattr(asf, key))
     return audio
+
+Parser.sniff = Asf.sniff
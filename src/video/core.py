@@ -34,7 +34,8 @@ import os
 
 from ..core import ParseError, Media, MEDIA_VIDEO, MEDIA_SUBTITLE, \
      MEDIA_CHAPTER, MEDIA_AV, MEDIA_AUDIO, MEDIA_DISC, Collection, Tag, Tags, \
-     feature_enabled, feature_config
+     feature_enabled, feature_config, read_view, file_size, wanted, binary_ref, \
+     BinaryRef
 
 from ..audio.core import Audio as AudioStream
 
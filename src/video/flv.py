@@ -83,6 +83,11 @@ class FlashVideo(core.AVContainer):
     """
     table_mapping = { 'FLVINFO' : FLVINFO }
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:3] == b'FLV' else 0
+
+
     def __init__(self,file):
         core.AVContainer.__init__(self)
         self.mime = 'video/flv'
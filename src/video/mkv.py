@@ -103,6 +103,10 @@ MATROSKA_FILE_NAME_ID             = 0x466E
 MATROSKA_FILE_MIME_TYPE_ID        = 0x4660
 MATROSKA_FILE_DATA_ID             = 0x465C
 
+# bytes read from the start of an attached file to get its name and
+# type, the data itself is not read
+ATTACHMENT_HEAD_SIZE              = 4096
+
 MATROSKA_SEEKHEAD_ID              = 0x114D9B74
 MATROSKA_SEEK_ID                  = 0x4DBB
 MATROSKA_SEEKID_ID                = 0x53AB
@@ -240,13 +244,17 @@ TAGS_MAP = {
     'synopsis': ('synopsis', None),
 }
 
+# attributes set from tags, tags_to_attributes also sets the series
+TAGS_ATTRIBUTES = tuple(set(attr for attr, _ in TAGS_MAP.values())) + \
+                  ('series', 'season', 'episode')
+
 
 class EbmlEntity:
     """
     This is class that is responsible to handle one Ebml entity as described in
     the Matroska/Ebml spec
     """
-    def __init__(self, inbuf):
+    def __init__(self, inbuf, offset=None):
         # Compute the EBML id
         # Set the CRC len to zero
         self.crc_len = 0
@@ -259,6 +267,10 @@ class EbmlEntity:
             self.crc_len += self.get_total_len()
             inbuf = inbuf[self.get_total_len():]
             self.build_entity(inbuf)
+        # position of the entity in the file if known
+        self.offset = None
+        if offset is not None:
+            self.offset = offset + self.crc_len
 
     def build_entity(self, inbuf):
         self.compute_id(inbuf)
@@ -283,7 +295,7 @@ class EbmlEntity:
         maxlen = self.ebml_length - len(self.entity_data)
         if maxlen <= 0:
             return
-        self.entity_data += data[:maxlen]
+        self.entity_data = bytes(self.entity_data) + data[:maxlen]
         self.entity_len = len(self.entity_data)
 
 
@@ -310,7 +322,7 @@ class EbmlEntity:
                 return 0
             self.id_len = 4
             self.entity_id = (inbuf[0]<<24) | (inbuf[1]<<16) | (inbuf[2]<<8) | inbuf[3]
-        self.entity_str = inbuf[0:self.id_len]
+        self.entity_str = bytes(inbuf[0:self.id_len])
 
 
     def compute_len(self, inbuf):
@@ -354,16 +366,24 @@ class EbmlEntity:
 
 
     def get_data(self):
-        return self.entity_data
+        return bytes(self.entity_data)
+
+
+    def get_view(self):
+        """
+        Return the data as memoryview to walk through the children
+        without copying them.
+        """
+        return memoryview(self.entity_data)
 
 
     def get_utf8(self):
         # EBML RFC says "A string MAY be zero padded at the end."
-        return str(self.entity_data.rstrip(b'\x00'), 'utf-8', 'replace')
+        return str(bytes(self.entity_data).rstrip(b'\x00'), 'utf-8', 'replace')
 
 
     def get_str(self):
-        return str(self.entity_data.rstrip(b'\x00'), 'ascii', 'replace')
+        return str(bytes(self.entity_data).rstrip(b'\x00'), 'ascii', 'replace')
 
 
     def get_id(self):
@@ -386,6 +406,12 @@ class EbmlEntity:
         return self.id_len + self.len_size
 
 
+    def get_data_offset(self):
+        if self.offset is None:
+            return None
+        return self.offset + self.get_header_len()
+
+
 
 class Matroska(core.AVContainer):
     """
@@ -394,6 +420,11 @@ class Matroska(core.AVContainer):
     """
     media = core.MEDIA_AUDIO
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:4] == b'\x1a\x45\xdf\xa3' else 0
+
+
     def __init__(self, file):
         core.AVContainer.__init__(self)
         self.samplerate = 1
@@ -402,13 +433,13 @@ class Matroska(core.AVContainer):
         # Read enough that we're likely to get the full seekhead and elements after
         # the seekhead (but before clusters) in case the file is truncated.
         # (FIXME: kludge.)
-        buffer = file.read(100000)
+        buffer = core.read_view(file, 100000)
         if not buffer:
             # Regular File end
             raise core.ParseError()
 
         # Check the Matroska header
-        header = EbmlEntity(buffer)
+        header = EbmlEntity(buffer, 0)
         if header.get_id() != MATROSKA_HEADER_ID:
             raise core.ParseError()
 
@@ -420,9 +451,10 @@ class Matroska(core.AVContainer):
         self._in_seekhead = False
 
         # Now get the segment
-        self.segment = segment = EbmlEntity(buffer[header.get_total_len():])
-        # Record file offset of segment data for seekheads
-        self.segment.offset = header.get_total_len() + segment.get_header_len()
+        segment = EbmlEntity(buffer[header.get_total_len():], header.get_total_len())
+        # Record file offset of segment data for seekheads. The segment
+        # itself is not kept, its data may be a view on the file.
+        self.segment_offset = header.get_total_len() + segment.get_header_len()
         if segment.get_id() != MATROSKA_SEGMENT_ID:
             log.debug("SEGMENT ID not found %08X" % segment.get_id())
             return
@@ -467,8 +499,23 @@ class Matroska(core.AVContainer):
             log.debug('WARNING: file has no index')
             self._set('corrupt', True)
 
+    def wanted(self, elem_id):
+        """
+        Return False if the element with the given id is not needed for
+        the keys requested.
+        """
+        if elem_id == MATROSKA_ATTACHMENTS_ID:
+            return core.wanted(self.file, 'thumbnail')
+        if elem_id == MATROSKA_TAGS_ID:
+            return core.wanted(self.file, 'tags', *TAGS_ATTRIBUTES)
+        return True
+
+
     def process_elem(self, elem):
         elem_id = elem.get_id()
+        if not self.wanted(elem_id):
+            log.debug('skipping element %x', elem_id)
+            return True
         log.debug('BEGIN: process element %x size %d', elem_id, elem.entity_len)
         if elem_id == MATROSKA_SEGMENT_INFO_ID:
             duration = 0
@@ -520,18 +567,23 @@ class Matroska(core.AVContainer):
                 continue
             for sub_elem in self.process_one_level(seek_elem):
                 if sub_elem.get_id() == MATROSKA_SEEK_POSITION_ID:
-                    self.file.seek(self.segment.offset + sub_elem.get_value())
+                    offset = self.segment_offset + sub_elem.get_value()
+                    self.file.seek(offset)
                     buffer = self.file.read(100)
-                    elem = EbmlEntity(buffer)
-                    # Fetch all data necessary for this element.
-                    if elem.ebml_length > 100:
+                    elem = EbmlEntity(buffer, offset)
+                    if not self.wanted(elem.get_id()):
+                        # do not read attachments or tags not needed
+                        continue
+                    # Fetch all data necessary for this element. The
+                    # attachments are read by process_attachments.
+                    if elem.ebml_length > 100 and elem.get_id() != MATROSKA_ATTACHMENTS_ID:
                         elem.add_data(self.file.read(elem.ebml_length - 100))
                     self.process_elem(elem)
         self._in_seekhead = False
 
 
     def process_tracks(self, tracks):
-        tracksbuf = tracks.get_data()
+        tracksbuf = tracks.get_view()
         index = 0
         while index < tracks.get_len():
             trackelem = EbmlEntity(tracksbuf[index:])
@@ -540,12 +592,13 @@ class Matroska(core.AVContainer):
 
 
     def process_one_level(self, item):
-        buf = item.get_data()
+        buf = item.get_view()
+        offset = item.get_data_offset()
         index = 0
         while index < item.get_len():
-            if len(buf[index:]) == 0:
+            if index >= len(buf):
                 break
-            elem = EbmlEntity(buf[index:])
+            elem = EbmlEntity(buf[index:], None if offset is None else offset + index)
             yield elem
             index += elem.get_total_len() + elem.get_crc_len()
 
@@ -696,7 +749,7 @@ class Matroska(core.AVContainer):
         elements = self.process_one_level(chapters)
         for elem in elements:
             if elem.get_id() == MATROSKA_EDITION_ENTRY_ID:
-                buf = elem.get_data()
+                buf = elem.get_view()
                 index = 0
                 while index < elem.get_len():
                     sub_elem = EbmlEntity(buf[index:])
@@ -732,13 +785,18 @@ class Matroska(core.AVContainer):
 
 
     def process_attachments(self, attachments):
-        buf = attachments.get_data()
-        index = 0
-        while index < attachments.get_len():
-            elem = EbmlEntity(buf[index:])
+        # Only the beginning of each attached file is read, the file
+        # data is stored as reference.
+        pos = attachments.get_data_offset()
+        end = pos + attachments.ebml_length
+        while pos < end:
+            self.file.seek(pos)
+            elem = EbmlEntity(self.file.read(ATTACHMENT_HEAD_SIZE), pos)
             if elem.get_id() == MATROSKA_ATTACHED_FILE_ID:
                 self.process_attachment(elem)
-            index += elem.get_total_len() + elem.get_crc_len()
+            if not elem.ebml_length:
+                break
+            pos = elem.get_data_offset() + elem.ebml_length
 
 
     def process_attachment(self, attachment):
@@ -747,21 +805,25 @@ class Matroska(core.AVContainer):
         mimetype = b''
         data = None
 
-        for elem in elements:
-            elem_id = elem.get_id()
-            if elem_id == MATROSKA_FILE_NAME_ID:
-                name = elem.get_utf8()
-            elif elem_id == MATROSKA_FILE_DESC_ID:
-                desc = elem.get_utf8()
-            elif elem_id == MATROSKA_FILE_MIME_TYPE_ID:
-                mimetype = elem.get_data()
-            elif elem_id == MATROSKA_FILE_DATA_ID:
-                data = elem.get_data()
+        try:
+            for elem in elements:
+                elem_id = elem.get_id()
+                if elem_id == MATROSKA_FILE_NAME_ID:
+                    name = elem.get_utf8()
+                elif elem_id == MATROSKA_FILE_DESC_ID:
+                    desc = elem.get_utf8()
+                elif elem_id == MATROSKA_FILE_MIME_TYPE_ID:
+                    mimetype = elem.get_data()
+                elif elem_id == MATROSKA_FILE_DATA_ID:
+                    data = elem.get_data_offset(), elem.ebml_length
+        except core.ParseError:
+            # element cut off at the end of the data read
+            pass
 
         # Right now we only support attachments that could be cover images.
         # Make a guess to see if this attachment is a cover image.
-        if mimetype.startswith(b"image/") and "cover" in (name+desc).lower() and data:
-            self.thumbnail = data
+        if mimetype.startswith(b"image/") and "cover" in (name+desc).lower() and data and data[1]:
+            self.thumbnail = core.binary_ref(self.file, *data)
 
         log.debug('Attachment "%s" found' % name)
 
@@ -865,7 +927,7 @@ class Matroska(core.AVContainer):
                 continue
 
             attr, filter = TAGS_MAP[name]
-            if attr not in obj._keys and attr not in self._keys:
+            if attr not in obj._keyset and attr not in self._keyset:
                 # Tag is not in any core attribute for this object or global,
                 # so skip.
                 continue
@@ -895,7 +957,7 @@ class Matroska(core.AVContainer):
                 # store current value of title as series and use current
                 # value of title as title
                 self.series = self.title
-            if attr in obj._keys:
+            if attr in obj._keyset:
                 setattr(obj, attr, value)
             else:
                 setattr(self, attr, value)
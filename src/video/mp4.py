@@ -172,6 +172,16 @@ class MPEG4(core.AVContainer):
     """
     table_mapping = { 'QTUDTA': QTUDTA }
 
+    @classmethod
+    def sniff(cls, head):
+        atom = head[4:8]
+        if atom in (b'ftyp', b'moov'):
+            return 1.0
+        if atom in (b'mdat', b'skip', b'pnot', b'PICT', b'wide', b'free'):
+            return 0.5
+        return 0
+
+
     def __init__(self,file):
         core.AVContainer.__init__(self)
         self._references = []
@@ -239,7 +249,7 @@ class MPEG4(core.AVContainer):
             pos = 0
             tabl = {}
             i18ntabl = {}
-            atomdata = file.read(atomsize-8)
+            atomdata = core.read_view(file, atomsize-8)
             while pos < atomsize-12:
                 (datasize, datatype) = struct.unpack('>I4s', atomdata[pos:pos+8])
                 if datatype[0] == 169:
@@ -249,7 +259,7 @@ class MPEG4(core.AVContainer):
                         # first 4 Bytes are i18n header
                         (tlen, lang) = struct.unpack('>HH', atomdata[mypos:mypos+4])
                         i18ntabl[lang] = i18ntabl.get(lang, {})
-                        l = atomdata[mypos+4:mypos+tlen+4]
+                        l = bytes(atomdata[mypos+4:mypos+tlen+4])
                         i18ntabl[lang][datatype[1:]] = l
                         mypos += tlen+4
                 elif datatype == b'WLOC':
@@ -257,7 +267,7 @@ class MPEG4(core.AVContainer):
                     pass
                 else:
                     if atomdata[pos+8:pos+datasize][0] > 1:
-                        tabl[datatype] = atomdata[pos+8:pos+datasize]
+                        tabl[datatype] = bytes(atomdata[pos+8:pos+datasize])
                 pos += datasize
             if len(list(i18ntabl.keys())) > 0:
                 for k in list(i18ntabl.keys()):
@@ -269,7 +279,7 @@ class MPEG4(core.AVContainer):
                 self._appendtable('QTUDTA', tabl)
 
         elif atomtype == b'trak':
-            atomdata = file.read(atomsize-8)
+            atomdata = core.read_view(file, atomsize-8)
             pos = 0
             trackinfo = {}
             tracktype = None
@@ -417,7 +427,7 @@ class MPEG4(core.AVContainer):
                         log.exception('There was a proble decompressiong atom')
                         return atomsize
 
-                decompressedIO = io.StringIO(decompressed)
+                decompressedIO = io.BytesIO(decompressed)
                 while self._readatom(decompressedIO):
                     pass
 
@@ -448,7 +458,7 @@ class MPEG4(core.AVContainer):
 
         elif atomtype == b'rmda':
             # reference
-            atomdata = file.read(atomsize-8)
+            atomdata = core.read_view(file, atomsize-8)
             pos   = 0
             url = ''
             quality = 0
@@ -458,9 +468,9 @@ class MPEG4(core.AVContainer):
                 if datatype == b'rdrf':
                     rflags, rtype, rlen = struct.unpack('>I4sI', atomdata[pos+8:pos+20])
                     if rtype == b'url ':
-                        url = atomdata[pos+20:pos+20+rlen]
-                        if url.find('\0') > 0:
-                            url = url[:url.find('\0')]
+                        url = bytes(atomdata[pos+20:pos+20+rlen])
+                        if url.find(b'\0') > 0:
+                            url = url[:url.find(b'\0')]
                 elif datatype == b'rmqu':
                     quality = struct.unpack('>I', atomdata[pos+8:pos+12])[0]
 
@@ -32,10 +32,8 @@
 __all__ = ['Parser']
 
 # python imports
-import os
 import struct
 import logging
-import stat
 
 # import kaa.metadata.video core
 from . import core
@@ -142,6 +140,22 @@ class MPEG(core.AVContainer):
     no additional metadata like title, etc; only codecs, length and
     resolution is reported back.
     """
+    @classmethod
+    def sniff(cls, head):
+        # pack header after some zero bytes (system mpeg)
+        zeros = len(head) - len(head.lstrip(b'\x00'))
+        if zeros >= 2 and head[zeros-2:zeros+2] == b'\x00\x00\x01\xba':
+            return 1.0
+        # PES or elementary stream
+        if head[:3] == b'\x00\x00\x01':
+            return 0.5
+        # two TS sync bytes one packet apart (like isTS)
+        for c in range(min(TS_PACKET_LENGTH, len(head) - TS_PACKET_LENGTH)):
+            if head[c] == head[c+TS_PACKET_LENGTH] == TS_SYNC:
+                return 0.3
+        return 0
+
+
     def __init__(self,file):
         core.AVContainer.__init__(self)
         self.sequence_header_offset = 0
@@ -235,7 +249,7 @@ class MPEG(core.AVContainer):
         Search for the Sequence_Extension in the extension header (01B5)
         """
         file.seek(0)
-        buffer = ''
+        buffer = b''
         count  = 0
         while 1:
             if len(buffer) < 1000:
@@ -245,7 +259,7 @@ class MPEG(core.AVContainer):
                 buffer += file.read(1024)
             if len(buffer) < 1000:
                 break
-            pos = buffer.find('\x00\x00\x01\xb5')
+            pos = buffer.find(b'\x00\x00\x01\xb5')
             if pos == -1 or len(buffer) - pos < 5:
                 buffer = buffer[-10:]
                 continue
@@ -369,7 +383,7 @@ class MPEG(core.AVContainer):
         Handle MPEG header in buffer on position offset
         Return None on error, new offset or 0 if the new offset can't be scanned
         """
-        if buffer[offset:offset+3] != '\x00\x00\x01':
+        if buffer[offset:offset+3] != b'\x00\x00\x01':
             return None
 
         id = buffer[offset+3]
@@ -425,7 +439,7 @@ class MPEG(core.AVContainer):
             add = buffer[offset+8]
             # if (buffer[offset+6] & 4) or 1:
             # id = buffer[offset+10+add]
-            if buffer[offset+11+add:offset+15+add].find('\x0b\x77') != -1:
+            if buffer.find(b'\x0b\x77', offset+11+add, offset+15+add) != -1:
                 # AC3 stream
                 for a in self.audio:
                     if a.id == id:
@@ -457,12 +471,12 @@ class MPEG(core.AVContainer):
         offset = 0
 
         # seek until the 0 byte stop
-        while offset < len(buffer)-100 and buffer[offset] == '\0':
+        while offset < len(buffer)-100 and buffer[offset] == 0:
             offset += 1
         offset -= 2
 
         # test for mpeg header 0x00 0x00 0x01
-        header = b'\x00\x00\x01%s' % bytes(PACK_PKT)
+        header = b'\x00\x00\x01' + bytes([PACK_PKT])
         if offset < 0 or not buffer[offset:offset+4] == header:
             if not force:
                 return 0
@@ -480,9 +494,9 @@ class MPEG(core.AVContainer):
         self.ReadHeader(buffer, offset)
 
         # store first timestamp
-        self.start = self.get_time(buffer[offset+4:])
+        self.start = self.get_time(buffer[offset+4:offset+10])
         while len(buffer) > offset + 1000 and \
-                  buffer[offset:offset+3] == '\x00\x00\x01':
+                  buffer[offset:offset+3] == b'\x00\x00\x01':
             # read the mpeg header
             new_offset = self.ReadHeader(buffer, offset)
 
@@ -500,7 +514,9 @@ class MPEG(core.AVContainer):
 
             else:
                 # seek to new header by brute force
-                offset += buffer[offset+4:].find('\x00\x00\x01') + 4
+                offset = buffer.find(b'\x00\x00\x01', offset+4)
+                if offset == -1:
+                    break
 
         # fill in values for support functions:
         self.__seek_size__   = 1000000
@@ -509,16 +525,16 @@ class MPEG(core.AVContainer):
         self.filename        = file.name
 
         # get length of the file
-        self.length = self.get_length()
+        self.length = self.get_length(file)
         return 1
 
 
-    def _find_timer_(self, buffer):
+    def _find_timer_(self, buffer, start=0):
         """
-        Return position of timer in buffer or None if not found.
-        This function is valid for 'normal' mpeg files
+        Return position of timer in buffer after start or None if not
+        found. This function is valid for 'normal' mpeg files
         """
-        pos = buffer.find('\x00\x00\x01%s' % chr(PACK_PKT))
+        pos = buffer.find(b'\x00\x00\x01' + bytes([PACK_PKT]), start)
         if pos == -1:
             return None
         return pos + 4
@@ -537,7 +553,7 @@ class MPEG(core.AVContainer):
 
         http://dvd.sourceforge.net/dvdinfo/pes-hdr.html
         """
-        if not buffer[0:3] == '\x00\x00\x01':
+        if not buffer[0:3] == b'\x00\x00\x01':
             return 0, None
 
         packet_length = (buffer[4] << 8) + buffer[5] + 6
@@ -565,14 +581,14 @@ class MPEG(core.AVContainer):
 
             # new mpeg starting
             if buffer[header_length+9:header_length+13] == \
-                   '\x00\x00\x01\xB3' and not self.sequence_header_offset:
+                   b'\x00\x00\x01\xB3' and not self.sequence_header_offset:
                 # yes, remember offset for later use
                 self.sequence_header_offset = offset + header_length+9
         elif buffer[3] == 189 or buffer[3] == 191:
             # private stream. we don't know, but maybe we can guess later
             id = id or buffer[3] & 0xF
             if align and \
-                   buffer[header_length+9:header_length+11] == '\x0b\x77':
+                   buffer[header_length+9:header_length+11] == b'\x0b\x77':
                 # AC3 stream
                 for a in self.audio:
                     if a.id == id:
@@ -609,7 +625,7 @@ class MPEG(core.AVContainer):
         buffer = file.read(3)
 
         # header (also valid for all mpegs)
-        if not buffer == '\x00\x00\x01':
+        if not buffer == b'\x00\x00\x01':
             return 0
 
         self.sequence_header_offset = 0
@@ -617,7 +633,7 @@ class MPEG(core.AVContainer):
 
         offset = 0
         while offset + 1000 < len(buffer):
-            pos, timestamp = self.ReadPESHeader(offset, buffer[offset:])
+            pos, timestamp = self.ReadPESHeader(offset, memoryview(buffer)[offset:])
             if not pos:
                 return 0
             if timestamp != None and not hasattr(self, 'start'):
@@ -646,29 +662,32 @@ class MPEG(core.AVContainer):
         self.filename        = file.name
 
         # get length of the file
-        self.length = self.get_length()
+        self.length = self.get_length(file)
         return 1
 
 
-    def _find_timer_PES_(self, buffer):
+    def _find_timer_PES_(self, buffer, start=0):
         """
-        Return position of timer in buffer or -1 if not found.
-        This function is valid for PES files
+        Return position of timer in buffer after start or None if not
+        found. This function is valid for PES files
         """
-        pos    = buffer.find('\x00\x00\x01')
-        offset = 0
+        pos    = buffer.find(b'\x00\x00\x01', start)
+        offset = start
         if pos == -1 or offset + 1000 >= len(buffer):
             return None
 
+        view     = memoryview(buffer)
         retpos   = -1
         ackcount = 0
         while offset + 1000 < len(buffer):
-            pos, timestamp = self.ReadPESHeader(offset, buffer[offset:])
+            pos, timestamp = self.ReadPESHeader(offset, view[offset:])
             if timestamp != None and retpos == -1:
                 retpos = offset + timestamp
             if pos == 0:
                 # Oops, that was a mpeg header, no PES header
-                offset  += buffer[offset:].find('\x00\x00\x01')
+                offset   = buffer.find(b'\x00\x00\x01', offset + 1)
+                if offset == -1:
+                    return None
                 retpos   = -1
                 ackcount = 0
             else:
@@ -751,7 +770,7 @@ class MPEG(core.AVContainer):
                 pass
             elif adapt & 0x01:
                 # PES
-                timestamp = self.ReadPESHeader(c+offset, buffer[c+offset:],
+                timestamp = self.ReadPESHeader(c+offset, memoryview(buffer)[c+offset:],
                                                tsid)[1]
                 if timestamp != None:
                     if not hasattr(self, 'start'):
@@ -787,12 +806,16 @@ class MPEG(core.AVContainer):
         self.filename        = file.name
 
         # get length of the file
-        self.length = self.get_length()
+        self.length = self.get_length(file)
         return 1
 
 
-    def _find_timer_TS_(self, buffer):
-        c = 0
+    def _find_timer_TS_(self, buffer, start=0):
+        """
+        Return position of timer in buffer after start or None if not
+        found. This function is valid for TS files
+        """
+        c = start
 
         while c + TS_PACKET_LENGTH < len(buffer):
             if buffer[c] == buffer[c+TS_PACKET_LENGTH] == TS_SYNC:
@@ -816,7 +839,7 @@ class MPEG(core.AVContainer):
                 offset += buffer[c+offset] + 1
 
             if adapt & 0x01:
-                timestamp = self.ReadPESHeader(c+offset, buffer[c+offset:], tsid)[1]
+                timestamp = self.ReadPESHeader(c+offset, memoryview(buffer)[c+offset:], tsid)[1]
                 if timestamp is None:
                     # this should not happen
                     log.error('bad TS')
@@ -829,38 +852,36 @@ class MPEG(core.AVContainer):
 
     # Support functions ==============================================
 
-    def get_endpos(self):
+    def get_endpos(self, file):
         """
         get the last timestamp of the mpeg, return -1 if this is not possible
         """
-        if not hasattr(self, 'filename') or not hasattr(self, 'start'):
+        if not hasattr(self, 'start'):
             return None
 
-        length = os.stat(self.filename)[stat.ST_SIZE]
+        length = core.file_size(file)
         if length < self.__sample_size__:
             return
 
-        file = open(self.filename)
         file.seek(length - self.__sample_size__)
         buffer = file.read(self.__sample_size__)
 
         end = None
+        pos = 0
         while 1:
-            pos = self.__search__(buffer)
+            pos = self.__search__(buffer, pos)
             if pos == None:
                 break
-            end = self.get_time(buffer[pos:]) or end
-            buffer = buffer[pos+100:]
-
-        file.close()
+            end = self.get_time(buffer[pos:pos+6]) or end
+            pos += 100
         return end
 
 
-    def get_length(self):
+    def get_length(self, file):
         """
         get the length in seconds, return -1 if this is not possible
         """
-        end = self.get_endpos()
+        end = self.get_endpos(file)
         if end == None or self.start == None:
             return None
         if self.start > end:
@@ -873,10 +894,10 @@ class MPEG(core.AVContainer):
         Return the byte position in the file where the time position
         is 'pos' seconds. Return 0 if this is not possible
         """
-        if not hasattr(self, 'filename') or not hasattr(self, 'start'):
+        if not getattr(self, 'filename', None) or not hasattr(self, 'start'):
             return 0
 
-        file    = open(self.filename)
+        file    = open(self.filename, 'rb')
         seek_to = 0
 
         while 1:
@@ -887,7 +908,7 @@ class MPEG(core.AVContainer):
             pos = self.__search__(buffer)
             if pos != None:
                 # found something
-                nt = self.get_time(buffer[pos:])
+                nt = self.get_time(buffer[pos:pos+6])
                 if nt is not None and nt >= end_time:
                     # too much, break
                     break
@@ -902,10 +923,10 @@ class MPEG(core.AVContainer):
         """
         scan file for timestamps (may take a long time)
         """
-        if not hasattr(self, 'filename') or not hasattr(self, 'start'):
+        if not getattr(self, 'filename', None) or not hasattr(self, 'start'):
             return 0
 
-        file = open(self.filename)
+        file = open(self.filename, 'rb')
         log.debug('scanning file...')
         while 1:
             file.seek(self.__seek_size__ * 10, 1)
@@ -915,7 +936,7 @@ class MPEG(core.AVContainer):
             pos = self.__search__(buffer)
             if pos == None:
                 continue
-            log.debug('buffer position: %s' % self.get_time(buffer[pos:]))
+            log.debug('buffer position: %s' % self.get_time(buffer[pos:pos+6]))
 
         file.close()
         log.debug('done scanning file')
@@ -34,8 +34,6 @@ __all__ = ['Parser']
 # python imports
 import struct
 import re
-import stat
-import os
 import logging
 
 # import kaa.metadata.video core
@@ -74,6 +72,11 @@ class Ogm(core.AVContainer):
 
     table_mapping = { 'VORBISCOMMENT' : VORBISCOMMENT }
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:4] == b'OggS' else 0
+
+
     def __init__(self, file):
         core.AVContainer.__init__(self)
         self.samplerate  = 1
@@ -92,8 +95,9 @@ class Ogm(core.AVContainer):
                 break
 
         # seek to the end of the stream, to avoid scanning the whole file
-        if (os.stat(file.name)[stat.ST_SIZE] > 50000):
-            file.seek(os.stat(file.name)[stat.ST_SIZE]-49000)
+        size = core.file_size(file)
+        if size > 50000:
+            file.seek(size-49000)
 
         # read the rest of the file into a buffer
         h = file.read()
@@ -103,7 +107,7 @@ class Ogm(core.AVContainer):
             idx = h.find(b'OggS')
             pos = -49000 + idx
             if idx:
-                file.seek(os.stat(file.name)[stat.ST_SIZE] + pos)
+                file.seek(size + pos)
             while 1:
                 granule, nextlen = self._parseOGGS(file)
                 if not nextlen:
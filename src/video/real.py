@@ -45,6 +45,11 @@ from . import core
 log = logging.getLogger('metadata')
 
 class RealVideo(core.AVContainer):
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:4] == b'.RMF' else 0
+
+
     def __init__(self,file):
         core.AVContainer.__init__(self)
         self.mime = 'video/real'
@@ -81,6 +81,11 @@ class Riff(core.AVContainer):
     """
     table_mapping = { 'AVIINFO' : AVIINFO }
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:4] in (b'RIFF', b'SDSS') else 0
+
+
     def __init__(self,file):
         core.AVContainer.__init__(self)
         # read the header
@@ -103,7 +108,8 @@ class Riff(core.AVContainer):
         except IOError:
             log.exception('error in file, stop parsing')
 
-        self._find_subtitles(file.name)
+        if file.name:
+            self._find_subtitles(file.name)
 
         if not self.has_idx and self.media == core.MEDIA_AV:
             log.debug('WARNING: avi has no index')
@@ -154,10 +160,10 @@ class Riff(core.AVContainer):
 
     def _parseSTRH(self,t):
         retval = {}
-        retval['fccType'] = t[0:4]
+        retval['fccType'] = bytes(t[0:4])
         log.debug("_parseSTRH(%s) : %d bytes" % ( retval['fccType'], len(t)))
         if retval['fccType'] != b'auds':
-            retval['fccHandler'] = t[4:8]
+            retval['fccHandler'] = bytes(t[4:8])
             v = struct.unpack('<IHHIIIIIIIII',t[8:52])
             ( retval['dwFlags'],
               retval['wPriority'],
@@ -232,7 +238,7 @@ class Riff(core.AVContainer):
               retval['biClrUsed'],
               retval['biClrImportant'], ) = v
             vi = core.VideoStream()
-            vi.codec = tostr(t[16:20])
+            vi.codec = tostr(bytes(t[16:20]))
             vi.width = retval['biWidth']
             vi.height = retval['biHeight']
             # FIXME: Bitrate calculation is completely wrong.
@@ -249,7 +255,7 @@ class Riff(core.AVContainer):
         i = 0
 
         while i < len(t) - 8:
-            key = tostr(t[i:i+4])
+            key = tostr(bytes(t[i:i+4]))
             sz = struct.unpack('<I',t[i+4:i+8])[0]
             i+=8
             value = t[i:]
@@ -321,10 +327,13 @@ class Riff(core.AVContainer):
         # pathological cases.
         while i < min(1024*1024*5, size - 8) and n_dc < 5:
             data = file.read(8)
-            if data[0] == 0:
+            if data[:1] == b'\0':
                 # Eat leading nulls.
                 data = data[1:] + file.read(1)
                 i += 1
+            if len(data) < 8:
+                # end of file or read limit reached
+                return
 
             key, sz = struct.unpack('<4sI', data)
             if key[2:] != b'dc' or sz > 1024*500:
@@ -337,6 +346,7 @@ class Riff(core.AVContainer):
             n_dc += 1
             # Read video chunk into memory
             data = file.read(sz)
+            sz = len(data)
 
             #for p in range(0,min(80, sz)):
             #    print "%02x " % ord(data[p]),
@@ -351,7 +361,7 @@ class Riff(core.AVContainer):
                 return (v & 2**n-1 << (64-n-o)) >> 64-n-o
 
             while pos < sz:
-                startcode = ((startcode << 8) | ord(data[pos])) & 0xffffffff
+                startcode = ((startcode << 8) | data[pos]) & 0xffffffff
                 pos += 1
                 if startcode & 0xFFFFFF00 != 0x100:
                     # No startcode found yet
@@ -408,13 +418,13 @@ class Riff(core.AVContainer):
             # skip zero
             if t[i] == 0:
                 i += 1
-            key = tostr(t[i:i+4])
+            key = tostr(bytes(t[i:i+4]))
             sz = 0
 
             if key == 'LIST':
                 sz = struct.unpack('<I',t[i+4:i+8])[0]
                 i+=8
-                key = 'LIST:' + tostr(t[i:i+4])
+                key = 'LIST:' + tostr(bytes(t[i:i+4]))
                 value = self._parseLIST(t[i:i+sz])
                 if key == 'strl':
                     for k in list(value.keys()):
@@ -452,7 +462,7 @@ class Riff(core.AVContainer):
                 # in most cases this is some info stuff
                 if not key in list(AVIINFO.keys()) and key != 'IDIT':
                     log.debug("Unknown Key: %s, len: %d" % (key,sz))
-                value = t[i:i+sz]
+                value = bytes(t[i:i+sz])
                 if key == 'ISFT':
                     # product information
                     if value.find(b'\0') > 0:
@@ -509,7 +519,7 @@ class Riff(core.AVContainer):
                 log.debug('RIFF LIST "%s" too short: %s bytes' % (key, size))
                 return True
 
-            t = file.read(size-4)
+            t = core.read_view(file, size-4)
             log.debug('parse RIFF LIST "%s": %d bytes' % (key, size))
             value = self._parseLIST(t)
             self.header[key] = value
@@ -43,6 +43,11 @@ class VCDFile(core.Collection):
     """
     media = core.MEDIA_DISC
 
+    @classmethod
+    def sniff(cls, head):
+        return 1.0 if head[:6] == b'FILE "' else 0
+
+
     def __init__(self, file):
         core.Collection.__init__(self)
         self.offset = 0